@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+"""
+    Purpose of the script:
+        - Guard the scheduler parse cost of final_dag.py: fail when importing the DAG file exceeds a time budget,
+          loads provider/hook modules, or builds a different DAG on each parse.
+
+    Inputs:
+        - --budget: maximum median import time of final_dag.py in seconds, on top of `import airflow`
+          (the scheduler's DAG processor has airflow imported already)
+        - --runs: number of fresh interpreters to import the DAG in
+
+    Outputs:
+        - JSON summary on stdout
+        - Exit code 1 if any check fails (usable as a CI step)
+
+    Usage:
+        python -m benchmarks.dag_parse_time --budget 0.5 --runs 5
+"""
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules which must only be imported inside execute(), never at parse time. Only the modules added by
+# `import final_dag` are checked: `import airflow` itself may load e.g. psycopg2 for a Postgres metadata DB
+FORBIDDEN_MODULES = [
+    "airflow.hooks.postgres_hook",
+    "airflow.contrib.hooks.aws_hook",
+    "airflow.providers.postgres",
+    "airflow.providers.amazon",
+    "psycopg2",
+    "boto3",
+    "duckdb",
+]
+
+# Runs in a fresh interpreter, prints the measurement as JSON
+_PROBE = """
+import json, sys, time
+import airflow
+already_imported = set(sys.modules)
+started = time.perf_counter()
+import final_dag
+elapsed = time.perf_counter() - started
+added = set(sys.modules) - already_imported
+dag = final_dag.final_project_dag
+print(json.dumps({
+    "seconds": elapsed,
+    "forbidden_modules": sorted(m for m in added if any(m == f or m.startswith(f + ".") for f in %r)),
+    "start_date": dag.start_date.isoformat(),
+    "task_ids": sorted(dag.task_ids),
+}))
+""" % (FORBIDDEN_MODULES,)
+
+
+def probe_import():
+    output = subprocess.check_output([sys.executable, "-c", _PROBE], cwd=REPO_ROOT)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def check_parse_time(budget, runs):
+    """
+        Purpose of the function:
+            - Import final_dag.py in `runs` fresh interpreters and check the budget, imports and determinism
+        Input:
+            - budget: maximum median import time in seconds
+            - runs: number of imports
+        Output:
+            - (summary dictionary, list of failure messages)
+    """
+    probes = [probe_import() for _ in range(runs)]
+    median = statistics.median(probe["seconds"] for probe in probes)
+
+    failures = []
+    if median > budget:
+        failures.append(f"Median DAG import time {median:.3f}s exceeds the {budget:.3f}s budget")
+
+    forbidden = sorted({module for probe in probes for module in probe["forbidden_modules"]})
+    if forbidden:
+        failures.append(f"Provider modules imported at parse time: {', '.join(forbidden)}")
+
+    if len({(probe["start_date"], tuple(probe["task_ids"])) for probe in probes}) > 1:
+        failures.append("DAG definition differs between parses (start_date or tasks)")
+
+    summary = {
+        "runs": runs,
+        "budget_seconds": budget,
+        "median_seconds": round(median, 6),
+        "max_seconds": round(max(probe["seconds"] for probe in probes), 6),
+        "start_date": probes[0]["start_date"],
+        "failures": failures,
+    }
+    return summary, failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the parse time of final_dag.py")
+    parser.add_argument("--budget", type=float, default=0.5)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    summary, failures = check_parse_time(args.budget, args.runs)
+    print(json.dumps(summary, indent=2))
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,275 @@
+import argparse
+import json
+import os
+import random
+import string
+from datetime import datetime, timedelta, timezone
+
+"""
+    Purpose of the script:
+        - Generate deterministic synthetic log-data and song-data JSON files for benchmarking the pipeline.
+        - The records have the same keys and shapes as the Udacity datasets described by
+          staging_events_table_create and staging_songs_table_create in final_project_sql_statements.
+
+    Inputs:
+        - output_dir: directory receiving the log-data/ and song-data/ folders (used as PIPELINE_LOCAL_DATA_ROOT)
+        - scale_factor: 1.0 = 1,000 songs and 10,000 log events (~ the size of the Udacity sample)
+        - match_rate: share of NextSong events that reference an existing song (title, artist_name, duration)
+        - skew: Zipf exponent for song popularity and user activity (0 = uniform)
+        - seed: random seed, same inputs always give the same files
+
+    Outputs:
+        - song-data/<A>/<B>/<C>/<song_id>.json - one song per file, as in s3://udacity-dend/song-data
+        - log-data/<year>/<month>/<date>-events.json - newline-delimited events for one day, as in s3://udacity-dend/log-data
+
+    Usage:
+        python -m benchmarks.generate_data /tmp/pipeline-data --scale-factor 10 --match-rate 0.8 --skew 1.1
+"""
+
+SONGS_PER_SCALE_FACTOR = 1000
+EVENTS_PER_SCALE_FACTOR = 10000
+USERS_PER_SCALE_FACTOR = 100
+START_TIME = datetime(2018, 11, 1, tzinfo=timezone.utc)
+DAYS = 30
+PAGES = ["Home", "Login", "Logout", "Settings", "Help", "About", "Downgrade", "Upgrade"]
+NEXT_SONG_SHARE = 0.8
+# Logged-out visitors: "userId": "" and null user fields, as in s3://udacity-dend/log-data
+LOGGED_OUT_SHARE = 0.03
+LOGGED_OUT_PAGES = ["Home", "Login", "About", "Help", "Error"]
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/36.0.1985.143 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_9_4) AppleWebKit/537.77.4 (KHTML, like Gecko) Version/7.0.5 Safari/537.77.4",
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:31.0) Gecko/20100101 Firefox/31.0",
+]
+LOCATIONS = ["San Francisco-Oakland-Hayward, CA", "Atlanta-Sandy Springs-Roswell, GA", "Chicago-Naperville-Elgin, IL-IN-WI",
+             "New York-Newark-Jersey City, NY-NJ-PA", "Lansing-East Lansing, MI", "Portland-South Portland, ME"]
+
+
+def _random_id(rng, prefix, length=16):
+    return prefix + "".join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(length))
+
+
+def _random_words(rng, count):
+    return " ".join(
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))).capitalize()
+        for _ in range(count)
+    )
+
+
+def _zipf_weights(count, skew):
+    return [1.0 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+def generate_songs(rng, count):
+    """
+        Purpose of the function:
+            - Generate song-data records (one artist per ~3 songs)
+        Input:
+            - rng: random.Random instance
+            - count: number of songs
+        Output:
+            - List of song dictionaries
+    """
+    artists = []
+    for _ in range(max(1, count // 3)):
+        has_location = rng.random() < 0.5
+        artists.append({
+            "artist_id": _random_id(rng, "AR"),
+            "artist_latitude": round(rng.uniform(-60, 70), 5) if has_location else None,
+            "artist_longitude": round(rng.uniform(-150, 150), 5) if has_location else None,
+            "artist_location": rng.choice(LOCATIONS) if has_location else "",
+            "artist_name": _random_words(rng, rng.randint(1, 3)),
+        })
+
+    songs = []
+    for _ in range(count):
+        artist = rng.choice(artists)
+        songs.append(dict(
+            num_songs=1,
+            song_id=_random_id(rng, "SO"),
+            title=_random_words(rng, rng.randint(1, 5)),
+            duration=round(rng.uniform(60, 600), 5),
+            year=rng.choice([0, rng.randint(1960, 2018)]),
+            **artist
+        ))
+    return songs
+
+
+def _logged_out_event(rng, ts):
+    page = rng.choice(LOGGED_OUT_PAGES)
+    return {
+        "artist": None,
+        "auth": "Logged Out",
+        "firstName": None,
+        "gender": None,
+        "itemInSession": rng.randint(0, 5),
+        "lastName": None,
+        "length": None,
+        "level": rng.choice(["free", "paid"]),
+        "location": None,
+        "method": "PUT" if page == "Login" else "GET",
+        "page": page,
+        "registration": None,
+        "sessionId": rng.randint(1, 1000),
+        "song": None,
+        "status": 404 if page == "Error" else 200,
+        "ts": ts,
+        "userAgent": None,
+        "userId": "",
+    }
+
+
+def generate_events(rng, count, songs, users, match_rate, skew):
+    """
+        Purpose of the function:
+            - Generate log-data records referencing the generated songs
+            - LOGGED_OUT_SHARE of the events come from logged-out visitors (empty userId, null user fields)
+        Input:
+            - rng: random.Random instance
+            - count: number of events
+            - songs: songs returned by generate_songs()
+            - users: number of distinct users
+            - match_rate: share of NextSong events matching a song in song-data
+            - skew: Zipf exponent for song popularity and user activity
+        Output:
+            - List of event dictionaries sorted by ts
+    """
+    song_weights = _zipf_weights(len(songs), skew)
+    user_weights = _zipf_weights(users, skew)
+    user_profiles = [{
+        "userId": str(user_id),
+        "firstName": _random_words(rng, 1),
+        "lastName": _random_words(rng, 1),
+        "gender": rng.choice(["M", "F"]),
+        "level": rng.choice(["free", "paid"]),
+        "location": rng.choice(LOCATIONS),
+        "userAgent": rng.choice(USER_AGENTS),
+        "registration": float(int(START_TIME.timestamp() * 1000) - rng.randint(0, 10 ** 10)),
+        "sessionId": rng.randint(1, 1000),
+        "itemInSession": 0,
+    } for user_id in range(1, users + 1)]
+
+    period_ms = DAYS * 24 * 3600 * 1000
+    start_ms = int(START_TIME.timestamp() * 1000)
+
+    events = []
+    for _ in range(count):
+        if rng.random() < LOGGED_OUT_SHARE:
+            events.append(_logged_out_event(rng, start_ms + rng.randrange(period_ms)))
+            continue
+
+        user = rng.choices(user_profiles, weights=user_weights)[0]
+
+        # Occasionally start a new session / change subscription level
+        if rng.random() < 0.05:
+            user["sessionId"] += 1
+            user["itemInSession"] = 0
+        if rng.random() < 0.01:
+            user["level"] = "paid" if user["level"] == "free" else "free"
+
+        event = {
+            "artist": None,
+            "auth": "Logged In",
+            "firstName": user["firstName"],
+            "gender": user["gender"],
+            "itemInSession": user["itemInSession"],
+            "lastName": user["lastName"],
+            "length": None,
+            "level": user["level"],
+            "location": user["location"],
+            "method": "GET",
+            "page": rng.choice(PAGES),
+            "registration": user["registration"],
+            "sessionId": user["sessionId"],
+            "song": None,
+            "status": 200,
+            "ts": start_ms + rng.randrange(period_ms),
+            "userAgent": user["userAgent"],
+            "userId": user["userId"],
+        }
+        user["itemInSession"] += 1
+
+        if rng.random() < NEXT_SONG_SHARE:
+            event["page"] = "NextSong"
+            event["method"] = "PUT"
+            if rng.random() < match_rate:
+                song = rng.choices(songs, weights=song_weights)[0]
+                event["artist"], event["song"], event["length"] = song["artist_name"], song["title"], song["duration"]
+            else:
+                event["artist"] = _random_words(rng, 2)
+                event["song"] = _random_words(rng, 3)
+                event["length"] = round(rng.uniform(60, 600), 5)
+
+        events.append(event)
+
+    events.sort(key=lambda event: event["ts"])
+    return events
+
+
+def write_dataset(output_dir, songs, events):
+    """
+        Purpose of the function:
+            - Write the songs and events with the s3://udacity-dend folder layout
+        Input:
+            - output_dir: target directory
+            - songs, events: generated records
+        Output:
+            - Files under output_dir/song-data and output_dir/log-data
+    """
+    for song in songs:
+        song_id = song["song_id"]
+        song_dir = os.path.join(output_dir, "song-data", song_id[2], song_id[3], song_id[4])
+        os.makedirs(song_dir, exist_ok=True)
+        with open(os.path.join(song_dir, f"{song_id}.json"), "w", encoding="utf-8") as song_file:
+            song_file.write(json.dumps(song) + "\n")
+
+    events_by_day = {}
+    for event in events:
+        day = datetime.fromtimestamp(event["ts"] / 1000, tz=timezone.utc).date()
+        events_by_day.setdefault(day, []).append(event)
+
+    for day, day_events in events_by_day.items():
+        log_dir = os.path.join(output_dir, "log-data", f"{day:%Y}", f"{day:%m}")
+        os.makedirs(log_dir, exist_ok=True)
+        with open(os.path.join(log_dir, f"{day:%Y-%m-%d}-events.json"), "w", encoding="utf-8") as log_file:
+            for event in day_events:
+                log_file.write(json.dumps(event) + "\n")
+
+
+def generate_dataset(output_dir, scale_factor=1.0, match_rate=0.8, skew=1.0, seed=42):
+    """
+        Purpose of the function:
+            - Generate and write a full synthetic dataset
+        Input:
+            - output_dir, scale_factor, match_rate, skew, seed: see the script description
+        Output:
+            - Dictionary with the number of generated songs and events
+    """
+    if not 0 <= match_rate <= 1:
+        raise ValueError("match_rate must be between 0 and 1")
+
+    rng = random.Random(seed)
+    songs = generate_songs(rng, max(1, int(SONGS_PER_SCALE_FACTOR * scale_factor)))
+    events = generate_events(
+        rng,
+        max(1, int(EVENTS_PER_SCALE_FACTOR * scale_factor)),
+        songs,
+        max(1, int(USERS_PER_SCALE_FACTOR * scale_factor)),
+        match_rate,
+        skew
+    )
+    write_dataset(output_dir, songs, events)
+    return {"songs": len(songs), "events": len(events)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic log-data and song-data JSON files")
+    parser.add_argument("output_dir")
+    parser.add_argument("--scale-factor", type=float, default=1.0)
+    parser.add_argument("--match-rate", type=float, default=0.8)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    counts = generate_dataset(args.output_dir, args.scale_factor, args.match_rate, args.skew, args.seed)
+    print(f"Generated {counts['songs']} songs and {counts['events']} events in {args.output_dir}")
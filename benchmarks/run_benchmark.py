@@ -0,0 +1,331 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from benchmarks.generate_data import generate_dataset
+from udacity.common.execution_backend import DuckDBBackend, get_backend
+from udacity.common.final_project_sql_statements import SqlQueries
+from udacity.common.load_steps import FACT_TABLES, STAGING_TABLES, load_aggregate, load_dimension, load_fact, \
+    prevalidate_source, run_quality_checks, stage_table
+
+"""
+    Purpose of the script:
+        - Measure how each step of the pipeline scales with the input size on a local engine (DuckDB) or Postgres.
+
+    Inputs:
+        - --backend: "duckdb" (default, in-process) or "postgres" (needs Airflow and --conn-id)
+        - --data-dir: existing log-data/song-data root; when omitted a synthetic dataset is generated
+          with --scale-factor, --match-rate, --skew and --seed (see generate_data.py)
+        - --late-key: log-data key re-staged alone after the full load to measure the late-data path
+          (partition-scoped reprocessing); defaults to one day file of the generated dataset
+        - --validate: pre-validate the input files before staging (validate_input=True)
+        - --verify-aggregates: check the aggregate tables against a full recomputation (verify=True)
+        - --output: JSON results file (printed to stdout when omitted)
+
+    Outputs:
+        - JSON document with the run parameters, the git commit and, per stage, the elapsed time, rows produced,
+          rows/sec and the memory the stage added on top of the process memory when it started
+          (peak_rss_delta_mb), so runs can be compared per stage across commits
+
+    Functionality:
+        - Runs the operators' code paths (udacity/common/load_steps.py), in the DAG order:
+            1. StageToRedshiftOperator: pre-validation (optional), staging_events and staging_songs
+            2. LoadFactOperator: songplay_table_insert
+            3. LoadDimensionOperator: user, song, artist and time inserts
+            4. LoadAggregateOperator: hourly aggregate tables
+            5. DataQualityOperator: SqlQueries.data_quality_checks
+        - Then the same steps for the late-data path, scoped to the hours of --late-key (stages prefixed late_)
+
+    Usage:
+        python -m benchmarks.run_benchmark --scale-factor 10 --output bench_sf10.json
+"""
+
+LOG = logging.getLogger("benchmark")
+
+DIMENSIONS = [
+    # (table, insert query, partitions_task_id set in final_dag.py, merge)
+    ("user_info", SqlQueries.user_table_insert, True, True),
+    ("song", SqlQueries.song_table_insert, False, False),
+    ("artist", SqlQueries.artist_table_insert, False, False),
+    ("time", SqlQueries.time_table_insert, True, False),
+]
+
+AGGREGATES = [
+    ("songplay_hourly_level", SqlQueries.songplay_hourly_level_insert),
+    ("songplay_hourly_artist", SqlQueries.songplay_hourly_artist_insert),
+]
+
+ALL_TABLES = (list(STAGING_TABLES) + list(FACT_TABLES) + [table for table, *_ in DIMENSIONS]
+              + [table for table, _ in AGGREGATES])
+
+# Day file re-staged by the late-data phase of a generated dataset
+DEFAULT_LATE_KEY = "log-data/2018/11/2018-11-15-events.json"
+
+
+def _current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No procfs (e.g. macOS) - fall back to the process high-water mark (the per-stage deltas then only show
+        # the stages which raise it)
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class PeakMemorySampler:
+    """
+        Purpose of the class:
+            - Track the peak resident memory of the process while a stage runs (includes native engine memory,
+              which tracemalloc does not see), relative to the resident memory when the stage started - memory
+              still held from the earlier stages (e.g. DuckDB buffers) is not attributed to the stage
+            - Worker processes (the validation process pool) are not included
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _current_rss_bytes())
+            self._stop.wait(self.interval)
+
+    @property
+    def peak_delta(self):
+        return self.peak - self.start
+
+    def __enter__(self):
+        self.start = self.peak = _current_rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss_bytes())
+
+
+def measure(stage, action, count_rows):
+    """
+        Purpose of the function:
+            - Run one stage and collect its metrics
+        Input:
+            - stage: stage name
+            - action: callable running the stage
+            - count_rows: callable returning the number of rows the stage produced (run outside the timing)
+        Output:
+            - Dictionary with seconds, rows, rows_per_sec, peak_rss_delta_mb (peak minus the resident memory at the
+              start of the stage) and start_rss_mb
+    """
+    with PeakMemorySampler() as sampler:
+        started = time.perf_counter()
+        action()
+        elapsed = time.perf_counter() - started
+
+    rows = count_rows()
+    return {
+        "stage": stage,
+        "seconds": round(elapsed, 6),
+        "rows": rows,
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "peak_rss_delta_mb": round(sampler.peak_delta / (1024 * 1024), 1),
+        "start_rss_mb": round(sampler.start / (1024 * 1024), 1),
+    }
+
+
+def count_rows(backend, *tables):
+    return sum(backend.get_records(f"SELECT COUNT(*) FROM {table}")[0][0] for table in tables)
+
+
+def run_phase(backend, prefix, events_key, songs_key=None, partitioned=False, validate=False,
+              verify_aggregates=False):
+    """
+        Purpose of the function:
+            - Run the DAG tasks once through the same step functions as the operators (load_steps.py)
+        Input:
+            - backend: execution backend with the data root pointing to the dataset
+            - prefix: prefix of the stage names in the results (e.g. "late_")
+            - events_key, songs_key: keys of the log-data/song-data files to stage (songs are not re-staged if None)
+            - partitioned: record the ts hours of the staged events and scope the downstream steps to them,
+              as the DAG does with partitions_task_id='Stage_events'
+            - validate: pre-validate the staged files (validate_input=True)
+            - verify_aggregates: compare the aggregate tables with a full recomputation (verify=True)
+        Output:
+            - List of per-stage metrics
+    """
+    results = []
+    state = {"partitions": None, "events_key": events_key, "songs_key": songs_key}
+
+    def prevalidate(name, table):
+        def action():
+            state[name], state[name + "_summary"] = prevalidate_source(backend, "", state[name], table, LOG)
+        results.append(measure(f"{prefix}validate_{table}", action,
+                               lambda: state[name + "_summary"]["valid_records"]))
+
+    if validate:
+        prevalidate("events_key", "staging_events")
+
+    def stage_events():
+        state["partitions"] = stage_table(backend, "staging_events", state["events_key"], "", LOG,
+                                          partition_column="ts" if partitioned else None)
+    results.append(measure(f"{prefix}stage_events", stage_events, lambda: count_rows(backend, "staging_events")))
+
+    if songs_key:
+        if validate:
+            prevalidate("songs_key", "staging_songs")
+        results.append(measure(
+            f"{prefix}stage_songs",
+            lambda: stage_table(backend, "staging_songs", state["songs_key"], "", LOG),
+            lambda: count_rows(backend, "staging_songs")
+        ))
+
+    results.append(measure(
+        f"{prefix}load_songplay",
+        lambda: load_fact(backend, "songplay", SqlQueries.songplay_table_insert, LOG, partitions=state["partitions"]),
+        lambda: count_rows(backend, "songplay")
+    ))
+
+    for table, sql_query, partition_scoped, merge in DIMENSIONS:
+        results.append(measure(
+            f"{prefix}load_{table}",
+            lambda table=table, sql_query=sql_query, partition_scoped=partition_scoped, merge=merge: load_dimension(
+                backend, table, sql_query, LOG, partitions=state["partitions"] if partition_scoped else None,
+                merge=merge
+            ),
+            lambda table=table: count_rows(backend, table)
+        ))
+
+    for table, sql_query in AGGREGATES:
+        results.append(measure(
+            f"{prefix}aggregate_{table}",
+            lambda table=table, sql_query=sql_query: load_aggregate(
+                backend, table, sql_query, LOG, partitions=state["partitions"], verify=verify_aggregates
+            ),
+            lambda table=table: count_rows(backend, table)
+        ))
+
+    results.append(measure(
+        f"{prefix}data_quality_checks",
+        lambda: run_quality_checks(
+            backend,
+            [query for query, _ in SqlQueries.data_quality_checks],
+            [expected for _, expected in SqlQueries.data_quality_checks],
+            LOG,
+            partitions=state["partitions"]
+        ),
+        lambda: count_rows(backend, *FACT_TABLES, *(table for table, *_ in DIMENSIONS))
+    ))
+    return results
+
+
+def run_pipeline(backend, late_key=None, validate=False, verify_aggregates=False):
+    """
+        Purpose of the function:
+            - Initial full load, then (if late_key is set) the late-data path: re-stage late_key alone and rebuild
+              only the hours it touches
+        Output:
+            - List of per-stage metrics
+    """
+    for table in ALL_TABLES:
+        backend.run(f"DROP TABLE IF EXISTS {table};")
+
+    results = run_phase(backend, "", "log-data", "song-data", validate=validate,
+                        verify_aggregates=verify_aggregates)
+    if late_key:
+        results += run_phase(backend, "late_", late_key, partitioned=True, validate=validate,
+                             verify_aggregates=verify_aggregates)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(backend_name="duckdb", data_dir=None, scale_factor=1.0, match_rate=0.8, skew=1.0, seed=42,
+                  conn_id="", duckdb_path=":memory:", late_key=None, validate=False, verify_aggregates=False):
+    """
+        Purpose of the function:
+            - Prepare the dataset and the backend, run the pipeline and build the results document
+        Input:
+            - See the script description
+        Output:
+            - Results dictionary (JSON serialisable)
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dataset = {"data_dir": data_dir}
+        if data_dir is None:
+            data_dir = temp_dir
+            dataset = dict(
+                scale_factor=scale_factor, match_rate=match_rate, skew=skew, seed=seed,
+                **generate_dataset(data_dir, scale_factor, match_rate, skew, seed)
+            )
+            if late_key is None and os.path.exists(os.path.join(data_dir, DEFAULT_LATE_KEY)):
+                late_key = DEFAULT_LATE_KEY
+        dataset.update(late_key=late_key, validate=validate, verify_aggregates=verify_aggregates)
+
+        if backend_name == "duckdb":
+            backend = DuckDBBackend(database=duckdb_path, data_root=data_dir)
+        else:
+            backend = get_backend(backend_name, conn_id)
+            backend.data_root = data_dir
+
+        try:
+            stages = run_pipeline(backend, late_key, validate, verify_aggregates)
+        finally:
+            if hasattr(backend, "close"):
+                backend.close()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "backend": backend_name,
+        "dataset": dataset,
+        "stages": stages,
+        "total_seconds": round(sum(stage["seconds"] for stage in stages), 6),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on a local engine")
+    parser.add_argument("--backend", choices=["duckdb", "postgres"], default="duckdb")
+    parser.add_argument("--conn-id", default="postgres_default", help="Airflow connection for --backend postgres")
+    parser.add_argument("--duckdb-path", default=":memory:")
+    parser.add_argument("--data-dir", help="Existing dataset root; a synthetic one is generated when omitted")
+    parser.add_argument("--scale-factor", type=float, default=1.0)
+    parser.add_argument("--match-rate", type=float, default=0.8)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--late-key", help="log-data key re-staged alone to measure the late-data path")
+    parser.add_argument("--validate", action="store_true", help="Pre-validate the input files before staging")
+    parser.add_argument("--verify-aggregates", action="store_true",
+                        help="Compare the aggregate tables with a full recomputation")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.backend, args.data_dir, args.scale_factor, args.match_rate, args.skew, args.seed,
+                            args.conn_id, args.duckdb_path, args.late_key, args.validate, args.verify_aggregates)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
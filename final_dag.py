@@ -1,14 +1,13 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 import pendulum
-import os
 from airflow.decorators import dag
 from airflow.operators.dummy_operator import DummyOperator
 from final_project_operators.stage_redshift import StageToRedshiftOperator
-from final_project_operators.load_fact import LoadFactOperator
-from final_project_operators.load_dimension import LoadDimensionOperator
+from final_project_operators.load_facts import LoadFactOperator
+from final_project_operators.load_dimensions import LoadDimensionOperator
 from final_project_operators.data_quality import DataQualityOperator
+from final_project_operators.load_aggregates import LoadAggregateOperator
 from udacity.common import final_project_sql_statements
-from airflow.operators.postgres_operator import PostgresOperator
 
 """
     Purpose of the script:
@@ -28,41 +27,64 @@ from airflow.operators.postgres_operator import PostgresOperator
             2. Load data from Redshift staging tables into fact tables (songplay).
             3. Load data from Redshift staging tables into dimension tables (user_info, song, artist, time).
             4. Run data quality checks to ensure data integrity.
+            5. Merge the new songplay partitions into the aggregate tables (songplay_hourly_level, songplay_hourly_artist).
         
     Functionality:
         - Staging tasks: Load raw log and song data from S3 into staging tables in Redshift.
+          The files are validated locally first; bad records go to s3://<bucket>/quarantine/ and COPY loads
+          only the clean set from s3://<bucket>/validated/.
         - Fact table loading tasks: Insert processed data into the songplay fact table from Redshift staging tables.
         - Dimension table loading tasks: Insert transformed data into user, song, artist, and time dimension tables.
         - Data quality check tasks: Validate that there are no missing or invalid values in the key tables.
+        - Late-arriving log data: Stage_events stages only the day file of the run's data interval (or the
+          `log_key` passed in the run conf) and records its event-time hours (`ts`); the songplay and time loads
+          delete/rebuild and the quality checks scan only those hours, the user load merges the new rows of the
+          batch instead of truncating the table. Stage_songs always stages the whole song-data prefix, so the
+          song and artist tables are fully reloaded from it on every run.
+        - Aggregate tasks: Replace the rows of the reprocessed hours in the hourly summary tables used by the dashboards.
         - Default args:
-            - Start now
             - No dependancies on past runs
             - Retry 3 times in case of task failure
             - Retries happen every 5 minutes
-            - No backfill past DAG runs
             - No email on retry
+        - DAG args:
+            - Fixed start date (START_DATE) - the DAG definition is the same on every scheduler parse
+            - No backfill past DAG runs (catchup=False)
+
+    Parse time:
+        - The scheduler re-parses this file constantly, so only the operator classes are imported here.
+        - Hooks/providers (PostgresHook, DuckDB) are imported inside the operators' execute() by execution_backend.py.
+        - benchmarks/dag_parse_time.py fails when the import exceeds its budget or loads provider modules.
 
     Task Dependencies:
         - Staging tables tasks run first.
         - Fact and dimension tables are loaded once the staging data have finished loading.
         - Data quality checks are executed after all loading tasks are completed.
+        - Aggregate tables are maintained once the data quality checks have passed.
         - The DAG runs starting from the `start_operator`, followed by staging, loading, and checking tasks, and ending at the `stop_operator`.
 """
 
+START_DATE = pendulum.datetime(2025, 4, 1, tz="UTC")
+
+# Each run stages only the day file of its data interval (log-data holds one file per day), so the downstream loads
+# touch at most 24 hours. Late or corrected files are reprocessed by triggering the DAG with {"log_key": "<key>"}
+EVENTS_S3_KEY = ("{{ (dag_run.conf or {}).get('log_key') "
+                 "or data_interval_start.strftime('log-data/%Y/%m/%Y-%m-%d-events.json') }}")
+
 default_args = {
     'owner': 'udacity',
-    'start_date': pendulum.now(), 
     'depends_on_past': False, 
     'retries': 3, 
     'retry_delay': timedelta(minutes=5), 
-    'catchup': False, 
     'email_on_retry': False, 
 }
 
 @dag(
     default_args=default_args,
     description='Load and transform data in Redshift with Airflow',
-    schedule_interval='0 * * * *'
+    schedule_interval='0 * * * *',
+    start_date=START_DATE,
+    catchup=False
 )
 def final_project():
     """
@@ -91,10 +113,13 @@ def final_project():
         aws_credentials_id="aws_default",
         table="staging_events",
         s3_bucket="kgolovko-data-pipelines",
-        s3_key="log-data",
+        s3_key=EVENTS_S3_KEY,
         json_path="log_json_path.json", 
         iam_role="arn:aws:iam::8xxxx6:role/my-redshift-service-role",
-        region="us-east-1"
+        region="us-east-1",
+        partition_column="ts",
+        partition_granularity="hour",
+        validate_input=True
     )
 
     stage_songs_to_redshift = StageToRedshiftOperator(
@@ -106,7 +131,8 @@ def final_project():
         s3_key="song-data",  
         json_path="auto",  
         iam_role="arn:aws:iam::8xxxx6:role/my-redshift-service-role",
-        region="us-east-1"
+        region="us-east-1",
+        validate_input=True
     )
 
 
@@ -116,7 +142,8 @@ def final_project():
         redshift_conn_id="redshift_default",
         target_table="songplay",
         append_only=False,
-        sql_query=final_project_sql_statements.SqlQueries.songplay_table_insert
+        sql_query=final_project_sql_statements.SqlQueries.songplay_table_insert,
+        partitions_task_id='Stage_events'
     )
 
     # LOAD DIMENSION TABLES
@@ -125,7 +152,9 @@ def final_project():
         sql_query=final_project_sql_statements.SqlQueries.user_table_insert,
         redshift_conn_id="redshift_default",
         target_table="user_info",
-        truncate=True
+        truncate=True,
+        partitions_task_id='Stage_events',
+        merge=True
     )
 
     load_song_dimension_table = LoadDimensionOperator(
@@ -146,27 +175,34 @@ def final_project():
         task_id='Load_time_dim_table',
         sql_query=final_project_sql_statements.SqlQueries.time_table_insert,
         redshift_conn_id="redshift_default",
-        target_table="time"
+        target_table="time",
+        partitions_task_id='Stage_events'
     )
 
     # DATA QUALITY CHECKS
     run_quality_checks = DataQualityOperator(
         task_id='Run_data_quality_checks',
         redshift_conn_id="redshift_default",
-        sql_queries = [
-            "SELECT COUNT(*) FROM songplay WHERE songplay_id IS NULL",
-            "SELECT COUNT(*) FROM user_info WHERE userid IS NULL",
-            "SELECT COUNT(*) FROM song WHERE song_id IS NULL",  
-            "SELECT COUNT(*) FROM artist WHERE artist_id IS NULL",  
-            "SELECT COUNT(*) FROM time WHERE start_time IS NULL"
-        ],
-        expected_results = [
-            0, 
-            0, 
-            0,
-            0,
-            0
-        ]
+        partitions_task_id='Stage_events',
+        sql_queries = [query for query, _ in final_project_sql_statements.SqlQueries.data_quality_checks],
+        expected_results = [expected for _, expected in final_project_sql_statements.SqlQueries.data_quality_checks]
+    )
+
+    # AGGREGATE TABLES
+    load_hourly_level_aggregate = LoadAggregateOperator(
+        task_id='Load_hourly_level_aggregate',
+        redshift_conn_id="redshift_default",
+        target_table="songplay_hourly_level",
+        sql_query=final_project_sql_statements.SqlQueries.songplay_hourly_level_insert,
+        partitions_task_id='Stage_events'
+    )
+
+    load_hourly_artist_aggregate = LoadAggregateOperator(
+        task_id='Load_hourly_artist_aggregate',
+        redshift_conn_id="redshift_default",
+        target_table="songplay_hourly_artist",
+        sql_query=final_project_sql_statements.SqlQueries.songplay_hourly_artist_insert,
+        partitions_task_id='Stage_events'
     )
 
     # TASK DEPENDANCIES
@@ -180,6 +216,7 @@ def final_project():
     load_songplays_table >> load_song_dimension_table >> run_quality_checks
     load_songplays_table >> load_artist_dimension_table >> run_quality_checks
     load_songplays_table >> load_time_dimension_table >> run_quality_checks
-    run_quality_checks >> stop_operator
+    run_quality_checks >> load_hourly_level_aggregate >> stop_operator
+    run_quality_checks >> load_hourly_artist_aggregate >> stop_operator
 
 final_project_dag = final_project()
\ No newline at end of file
@@ -1,13 +1,26 @@
 # final_project_operators/__init__.py
 
-from .load_fact import LoadFactOperator
-from .load_dimension import LoadDimensionOperator
-from .stage_redshift import StageToRedshiftOperator
-from .data_quality import DataQualityOperator
+import importlib
+
+# Operators are imported on first access so that importing one operator module does not load the others
+_OPERATOR_MODULES = {
+    'LoadFactOperator': '.load_facts',
+    'LoadDimensionOperator': '.load_dimensions',
+    'StageToRedshiftOperator': '.stage_redshift',
+    'DataQualityOperator': '.data_quality',
+    'LoadAggregateOperator': '.load_aggregates'
+}
 
 __all__ = [
     'LoadFactOperator',
     'LoadDimensionOperator',
     'StageToRedshiftOperator',
-    'DataQualityOperator'
-]
\ No newline at end of file
+    'DataQualityOperator',
+    'LoadAggregateOperator'
+]
+
+
+def __getattr__(name):
+    if name in _OPERATOR_MODULES:
+        return getattr(importlib.import_module(_OPERATOR_MODULES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
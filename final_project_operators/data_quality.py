@@ -1,6 +1,8 @@
-from airflow.hooks.postgres_hook import PostgresHook
 from airflow.models import BaseOperator
 from airflow.utils.decorators import apply_defaults
+from udacity.common.execution_backend import get_backend
+from udacity.common.load_steps import run_quality_checks
+from udacity.common.partitions import pull_partitions
 
 class DataQualityOperator(BaseOperator):
     """
@@ -10,11 +12,16 @@ class DataQualityOperator(BaseOperator):
             - redshift_conn_id: Airflow connection to Redshift
             - sql_queries: List of SQL queries for data quality checks
             - expected_results: List of expected results that each SQL query should return
+            - backend: Execution backend - "redshift" (default), "postgres" or "duckdb" (see execution_backend.py)
+            - partitions_task_id: Staging task which recorded the partitions of the batch (XCom); {partition_filter} in
+              the queries is replaced with a range predicate on partition_column for those partitions (1 = 1 if not set)
+            - partition_column: Timestamp column used in the {partition_filter} predicate
+            - partition_granularity: "hour" or "day" - must match the staging task
         Outputs: 
             - Logs success if all checks pass
             - Raises an error if any check fails/number of queries and expected result not match 
         execute() function does:
-            - Runs each query against Redshift using PostgresHook
+            - Runs each query against Redshift (or the configured execution backend)
             - Compares the result of each query with its expected result
             - Raises a ValueError if a mismatch/empty result is found
     """
@@ -26,11 +33,19 @@ class DataQualityOperator(BaseOperator):
                  redshift_conn_id="",
                  sql_queries=None,
                  expected_results=None,
+                 backend=None,
+                 partitions_task_id=None,
+                 partition_column="start_time",
+                 partition_granularity="hour",
                  *args, **kwargs):
         super(DataQualityOperator, self).__init__(*args, **kwargs)
         self.redshift_conn_id = redshift_conn_id
         self.sql_queries = sql_queries or []
         self.expected_results = expected_results or []
+        self.backend = backend
+        self.partitions_task_id = partitions_task_id
+        self.partition_column = partition_column
+        self.partition_granularity = partition_granularity
 
         if len(self.sql_queries) != len(self.expected_results):
             raise ValueError("The number of SQL queries must match the number of expected results.")
@@ -45,28 +60,23 @@ class DataQualityOperator(BaseOperator):
                 - Logs results of checks
                 - Raises errors for failed checks
             Functionality:
-                - Connects to Redshift
+                - Connects to Redshift (or the configured execution backend)
+                - Scopes the queries to the staged partitions ({partition_filter} placeholder)
                 - Iterates through each query in the list
                 - Runs the query and retrieves the result
                 - Compares the actual result to the expected result (provided in final_project.py)
                 - Logs pass/fail status
         """
 
-        redshift = PostgresHook(postgres_conn_id=self.redshift_conn_id)
+        redshift = get_backend(self.backend, self.redshift_conn_id)
+        partitions = pull_partitions(context, self.partitions_task_id, self.log)
 
-        for i, query in enumerate(self.sql_queries):
-            self.log.info(f"Executing query number {i+1}: {query}")
-
-            result = redshift.get_records(query)
-
-            if not result or not result[0]:
-                raise ValueError(f"Query returned no results: {query}")
-
-            actual_result = result[0][0]
-            expected_result = self.expected_results[i]
-
-            if actual_result != expected_result:
-                raise ValueError(f"Data quality check has failed. Query: {query}"
-                                 f"Expected result: {expected_result} vs Actual result: {actual_result}")
-
-            self.log.info(f"Data quality check has succeeded. Query: {query} vs Result: {actual_result}")
\ No newline at end of file
+        run_quality_checks(
+            redshift,
+            self.sql_queries,
+            self.expected_results,
+            self.log,
+            partitions=partitions,
+            partition_column=self.partition_column,
+            partition_granularity=self.partition_granularity
+        )
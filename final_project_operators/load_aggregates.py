@@ -0,0 +1,90 @@
+from airflow.models import BaseOperator
+from airflow.utils.decorators import apply_defaults
+from udacity.common.execution_backend import get_backend
+from udacity.common.load_steps import load_aggregate
+from udacity.common.partitions import pull_partitions
+
+class LoadAggregateOperator(BaseOperator):
+    """
+        Purpose of the Operator:
+            - Keep a summary table downstream of the songplay fact table up to date
+            - Apply only the partitions loaded in the current run (delta merge), with a full refresh fallback
+        Inputs:
+            - redshift_conn_id: Airflow connection to Redshift
+            - target_table: Name of the aggregate table (see AGGREGATE TABLES in final_project_sql_statements.py)
+            - sql_query: Aggregate SELECT with a {partition_filter} placeholder on the source start_time
+            - partitions_task_id: Staging task which recorded the partitions of the batch (XCom)
+            - partition_column: Hour column of the aggregate table (its grain must not be coarser than the partitions)
+            - source_partition_column: Timestamp column of the source used in {partition_filter}
+            - partition_granularity: "hour" or "day" - must match the staging task
+            - full_refresh: Boolean flag to recompute the whole table instead of merging the delta
+            - verify: Boolean flag to compare the table with a full recomputation after the load (full scan - tests/CI)
+            - backend: Execution backend - "redshift" (default), "postgres" or "duckdb" (see execution_backend.py)
+        Outputs:
+            - Aggregate table in Redshift with the rows of the reprocessed partitions replaced
+        execute() function does:
+            - Creates the aggregate table if it doesn't exist
+            - Delta merge: deletes the aggregate rows of the reprocessed partitions and inserts them recomputed
+              from those partitions only, in one statement batch
+            - Full refresh: truncates the table and recomputes it when full_refresh=True or no partitions were recorded
+            - Optionally verifies the result against a full recomputation
+    """
+
+    ui_color = '#F9C66B'
+
+    @apply_defaults
+    def __init__(self,
+                 redshift_conn_id="",
+                 target_table="",
+                 sql_query="",
+                 partitions_task_id=None,
+                 partition_column="start_hour",
+                 source_partition_column="songplay.start_time",
+                 partition_granularity="hour",
+                 full_refresh=False,
+                 verify=False,
+                 backend=None,
+                 *args, **kwargs):
+        super(LoadAggregateOperator, self).__init__(*args, **kwargs)
+
+        self.redshift_conn_id = redshift_conn_id
+        self.target_table = target_table
+        self.sql_query = sql_query
+        self.partitions_task_id = partitions_task_id
+        self.partition_column = partition_column
+        self.source_partition_column = source_partition_column
+        self.partition_granularity = partition_granularity
+        self.full_refresh = full_refresh
+        self.verify = verify
+        self.backend = backend
+
+    def execute(self, context):
+        """
+            Purpose of the function:
+                - Executes the delta merge (or full refresh) of the aggregate table
+            Input:
+                - context: Airflow context dictionary (partitions are pulled from XCom)
+            Output:
+                - The aggregate table is up to date with the songplay fact table
+            Functionality:
+                - Connects to Redshift (or the configured execution backend)
+                - Creates the aggregate table if it doesn't exist
+                - Runs DELETE + INSERT for the reprocessed partitions, or TRUNCATE + INSERT for a full refresh
+                - Raises a ValueError if verify=True and the table differs from a full recomputation
+        """
+
+        redshift = get_backend(self.backend, self.redshift_conn_id)
+        partitions = pull_partitions(context, self.partitions_task_id, self.log)
+
+        load_aggregate(
+            redshift,
+            self.target_table,
+            self.sql_query,
+            self.log,
+            partitions=partitions,
+            full_refresh=self.full_refresh,
+            verify=self.verify,
+            partition_column=self.partition_column,
+            source_partition_column=self.source_partition_column,
+            partition_granularity=self.partition_granularity
+        )
@@ -1,7 +1,8 @@
-from airflow.hooks.postgres_hook import PostgresHook
 from airflow.models import BaseOperator
 from airflow.utils.decorators import apply_defaults
-from udacity.common import final_project_sql_statements
+from udacity.common.execution_backend import get_backend
+from udacity.common.load_steps import load_dimension
+from udacity.common.partitions import pull_partitions
 
 class LoadDimensionOperator(BaseOperator):
     """
@@ -13,11 +14,19 @@ class LoadDimensionOperator(BaseOperator):
             - redshift_conn_id: Airflow connection ID to Redshift
             - target_table: Name of the dimension table to load data into
             - truncate: Boolean flag to determine whether to truncate the table before loading data in
+            - backend: Execution backend - "redshift" (default), "postgres" or "duckdb" (see execution_backend.py)
+            - partitions_task_id: Staging task which recorded the partitions of the batch (XCom); when set, only the
+              staged batch is loaded instead of truncating the table
+            - partition_column: Timestamp column of the dimension table used for the partitions (time dimension)
+            - partition_granularity: "hour" or "day" - must match the staging task
+            - merge: Boolean flag (user dimension) - with partitions_task_id, only the rows of the staged batch which
+              are not in the table yet are inserted; the rows loaded from the other days are kept
         Outputs: 
             - Populates the specified dimension table in Redshift with data
         execute function does:
             - Creates the table if it doesn't exist
-            - Truncates the table if `truncate` is set to True
+            - Truncates the table if `truncate` is set to True (deletes only the staged partitions if partitions_task_id is set,
+              nothing if merge is set too)
             - Executes the SQL insert query to load data into the dimension table
     """
 
@@ -29,6 +38,11 @@ class LoadDimensionOperator(BaseOperator):
                  redshift_conn_id="",  
                  target_table="",    
                  truncate=True,      
+                 backend=None,
+                 partitions_task_id=None,
+                 partition_column="start_time",
+                 partition_granularity="hour",
+                 merge=False,
                  *args, **kwargs):
 
         super(LoadDimensionOperator, self).__init__(*args, **kwargs)
@@ -37,6 +51,11 @@ class LoadDimensionOperator(BaseOperator):
         self.redshift_conn_id = redshift_conn_id
         self.target_table = target_table
         self.truncate = truncate
+        self.backend = backend
+        self.partitions_task_id = partitions_task_id
+        self.partition_column = partition_column
+        self.partition_granularity = partition_granularity
+        self.merge = merge
 
     def execute(self, context):
         """
@@ -47,55 +66,24 @@ class LoadDimensionOperator(BaseOperator):
             Output:
                 - Inserts specified data into the Redshift dimension table
             Functionality:
-                - Connects to Redshift using PostgresHook
+                - Connects to Redshift (or the configured execution backend)
                 - Runs a CREATE TABLE statement for a specified table name
                 - If `truncate` is set to True, clears all existing records from the table
+                  (only the records of the staged partitions if partitions_task_id is set, none if merge is set)
                 - Runs the final INSERT query using the provided SQL logic
         """
 
-        redshift = PostgresHook(postgres_conn_id=self.redshift_conn_id)
-        self.log.info(f"Loading data into {self.target_table}")
-
-        # Check whether table exists
-        check_table_exists_sql = f"""
-            SELECT 1
-            FROM information_schema.tables
-            WHERE table_schema = 'public'
-            AND table_name = '{self.target_table}';
-        """
-        table_exists = redshift.get_records(check_table_exists_sql)
-
-        if self.target_table == "user_info":
-            create_sql = final_project_sql_statements.SqlQueries.user_table_create
-        elif self.target_table == "song":
-            create_sql = final_project_sql_statements.SqlQueries.song_table_create
-        elif self.target_table == "artist":
-            create_sql = final_project_sql_statements.SqlQueries.artist_table_create
-        elif self.target_table == "time":
-            create_sql = final_project_sql_statements.SqlQueries.time_table_create
-        else:
-            raise ValueError(f"Unknown dimension table: {self.target_table}")
-
-        # Create table if it doesn't exist
-        if not table_exists:
-            self.log.info(f"Table '{self.target_table}' does not exist.")
-            redshift.run(create_sql)
-            self.log.info(f"Table '{self.target_table}' created successfully.")
-        else:
-            self.log.info(f"Table '{self.target_table}' already exists.")
-
-        # If truncate is enabled, first truncate the table
-        if self.truncate:
-            self.log.info(f"Truncating dimension table {self.target_table}")
-            # Run a TRUNCATE query to empty the table
-            truncate_sql = f"TRUNCATE TABLE {self.target_table};"
-            redshift.run(truncate_sql)
-
-        # Load the new data
-        self.log.info(f"Inserting new data into {self.target_table}")
-        
-        insert_statement = f"INSERT INTO {self.target_table} \n{self.sql_query}"
-        redshift.run(insert_statement)
-
-        self.log.info(f"Data successfully loaded into {self.target_table}")
+        redshift = get_backend(self.backend, self.redshift_conn_id)
+        partitions = pull_partitions(context, self.partitions_task_id, self.log)
 
+        load_dimension(
+            redshift,
+            self.target_table,
+            self.sql_query,
+            self.log,
+            truncate=self.truncate,
+            partitions=partitions,
+            partition_column=self.partition_column,
+            partition_granularity=self.partition_granularity,
+            merge=self.merge
+        )
@@ -1,7 +1,8 @@
-from airflow.hooks.postgres_hook import PostgresHook
 from airflow.models import BaseOperator
 from airflow.utils.decorators import apply_defaults
-from udacity.common import final_project_sql_statements
+from udacity.common.execution_backend import get_backend
+from udacity.common.load_steps import load_fact
+from udacity.common.partitions import pull_partitions
 
 class LoadFactOperator(BaseOperator):
     """
@@ -12,11 +13,16 @@ class LoadFactOperator(BaseOperator):
             - target_table: Name of the fact table to load data into
             - append_only: Boolean flag to determine whether existing data should be deleted before loading
             - sql_query: SQL query used to retrieve data to insert into the fact table
+            - backend: Execution backend - "redshift" (default), "postgres" or "duckdb" (see execution_backend.py)
+            - partitions_task_id: Staging task which recorded the partitions of the batch (XCom); when set, only
+              those partitions are deleted and rebuilt instead of the whole table
+            - partition_column: Timestamp column of the fact table used for the partitions
+            - partition_granularity: "hour" or "day" - must match the staging task
         Outputs: 
             - Data inserted into the specified fact table in Redshift
         execute() function does:
             - Checks if the fact table exists
-            - Deletes existing data if append_only set up to False (optional)
+            - Deletes existing data if append_only set up to False (optional) - only the staged partitions if partitions_task_id is set
             - Drops the table if it already exists by using sql queries from final_project_sql_statements.py file
             - Executes the INSERT INTO query to load data into the fact table
     """
@@ -29,6 +35,10 @@ class LoadFactOperator(BaseOperator):
                  target_table="",    
                  append_only=False,   
                  sql_query="",
+                 backend=None,
+                 partitions_task_id=None,
+                 partition_column="start_time",
+                 partition_granularity="hour",
                  *args, **kwargs):
         super(LoadFactOperator, self).__init__(*args, **kwargs)
         
@@ -36,6 +46,10 @@ class LoadFactOperator(BaseOperator):
         self.target_table = target_table
         self.append_only = append_only
         self.sql_query = sql_query
+        self.backend = backend
+        self.partitions_task_id = partitions_task_id
+        self.partition_column = partition_column
+        self.partition_granularity = partition_granularity
 
     def execute(self, context):
         """
@@ -49,47 +63,24 @@ class LoadFactOperator(BaseOperator):
                 - The fact table in Redshift is populated with new data (inserted)
 
             Functionality:
-                - Connects to Redshift
+                - Connects to Redshift (or the configured execution backend)
                 - Checks if the target fact table exists in Redshift
                 - Deletes all existing rows if append_only is set up to False
+                  (only the rows of the staged partitions if partitions_task_id is set)
                 - Creates a table using sql statements from final_project_sql_statements
                 - Executes an SQL query to insert data into the fact table
         """
 
-        redshift = PostgresHook(postgres_conn_id=self.redshift_conn_id)
+        redshift = get_backend(self.backend, self.redshift_conn_id)
+        partitions = pull_partitions(context, self.partitions_task_id, self.log)
 
-        # Check whether the table exists in the provided Redshift location
-        check_table_exists_sql = f"""
-            SELECT 1
-            FROM information_schema.tables
-            WHERE table_schema = 'public'
-            AND table_name = '{self.target_table}';
-        """
-        table_exists = redshift.get_records(check_table_exists_sql)
-
-        # Create the table if it does not exist
-        if not table_exists:
-            self.log.info(f"Table '{self.target_table}' does not exist.")
-            if self.target_table == "songplay":
-                create_sql = final_project_sql_statements.SqlQueries.songplay_table_create
-                redshift.run(create_sql)
-                self.log.info(f"Table '{self.target_table}' created successfully.")
-            else:
-                raise ValueError(f"Unknown fact table: {self.target_table}")
-        else:
-            self.log.info(f"Table '{self.target_table}' already exists.")
-
-        # Delete data if append-only=False
-        if not self.append_only:
-            self.log.info(f"Append mode is set to False. Deleting data from '{self.target_table}'.")
-            redshift.run(f"DELETE FROM {self.target_table}")
-        else:
-            self.log.info(f"Append mode is set to True. No records deletion for '{self.target_table}'.")
-
-        # Insert new data
-        self.log.info(f"Inserting data into '{self.target_table}' fact table.")
-        insert_statement = f"INSERT INTO {self.target_table} \n{self.sql_query}"
-        self.log.info(f"Running SQL:\n{insert_statement}")
-        redshift.run(insert_statement)
-
-        self.log.info(f"Successfully completed loading data into '{self.target_table}' fact table.")
+        load_fact(
+            redshift,
+            self.target_table,
+            self.sql_query,
+            self.log,
+            append_only=self.append_only,
+            partitions=partitions,
+            partition_column=self.partition_column,
+            partition_granularity=self.partition_granularity
+        )
@@ -1,8 +1,8 @@
-from airflow.hooks.postgres_hook import PostgresHook
+from airflow.exceptions import AirflowFailException
 from airflow.models import BaseOperator
 from airflow.utils.decorators import apply_defaults
-from airflow.contrib.hooks.aws_hook import AwsHook
-from udacity.common import final_project_sql_statements
+from udacity.common.execution_backend import get_backend
+from udacity.common.load_steps import InputValidationError, prevalidate_source, stage_table
 
 class StageToRedshiftOperator(BaseOperator):
     """
@@ -17,14 +17,29 @@ class StageToRedshiftOperator(BaseOperator):
             - json_path: JSON path for data mapping
             - iam_role: AWS IAM role ARN for Redshift COPY command access
             - region: AWS region where S3 data is located
+            - backend: Execution backend - "redshift" (default), "postgres" or "duckdb" (see execution_backend.py);
+              the local backends read the files from PIPELINE_LOCAL_DATA_ROOT/<s3_key> instead of running COPY
+            - partition_column: Epoch-milliseconds column (e.g. ts) - when set, the event-time partitions touched by the
+              batch are returned (XCom) for the partition-scoped fact/time loads and quality checks. The S3 key must
+              contain complete partitions, since the downstream loads rebuild them from this batch only
+            - partition_granularity: "hour" or "day"
+            - validate_input: Boolean flag to validate the JSON files against the staging schema before COPY
+            - validated_prefix: S3 prefix receiving the rewritten clean files and the COPY manifest
+              (COPY reads <validated_prefix>/<s3_key>.manifest)
+            - quarantine_prefix: S3 prefix receiving the rejected records (<file>.errors.json with the reasons)
+            - validation_workers: Number of validation processes (None = CPU count, 1 = in the task process)
+            - max_quarantined_records: Fail without retries (and without COPY) above this number of bad records
         Outputs: 
             - Redshift staging table, specified inside the final_project.py  
         execute() function does:
             - Connects to AWS and Redshift
             - Creates the staging table (DROP + CREATE Statements from final_project_sql_statements.py)
             - Goes through the S3 path dynamically using the execution context
+            - Pre-validates the input files locally and quarantines the bad records if validate_input=True
+              (COPY then loads the manifest of the untouched files and the rewritten clean files)
             - Constructs the COPY SQL command - uses reference from Project 2, which is included in final_project_sql_statements.py
             - Executes the COPY command to load data into Redshift
+            - Returns the partitions touched by the batch if `partition_column` is set
     """
 
     ui_color = '#358140'
@@ -38,6 +53,7 @@ class StageToRedshiftOperator(BaseOperator):
         FORMAT AS JSON '{json_path}'
         REGION '{region}'
         ACCEPTINVCHARS AS '?'
+        {manifest}
     """
 
 
@@ -51,6 +67,14 @@ class StageToRedshiftOperator(BaseOperator):
                  json_path="",
                  iam_role="",
                  region="", 
+                 backend=None,
+                 partition_column=None,
+                 partition_granularity="hour",
+                 validate_input=False,
+                 validated_prefix="validated",
+                 quarantine_prefix="quarantine",
+                 validation_workers=None,
+                 max_quarantined_records=None,
                  *args, **kwargs):
 
         super(StageToRedshiftOperator, self).__init__(*args, **kwargs)
@@ -63,6 +87,14 @@ class StageToRedshiftOperator(BaseOperator):
         self.json_path = json_path
         self.iam_role = iam_role
         self.region = region
+        self.backend = backend
+        self.partition_column = partition_column
+        self.partition_granularity = partition_granularity
+        self.validate_input = validate_input
+        self.validated_prefix = validated_prefix
+        self.quarantine_prefix = quarantine_prefix
+        self.validation_workers = validation_workers
+        self.max_quarantined_records = max_quarantined_records
 
     def execute(self, context):
         """
@@ -76,29 +108,39 @@ class StageToRedshiftOperator(BaseOperator):
                 - #Retrieves AWS credentials 
                 - Uses final_project_sql_statements.py script to get guidance on CREATE and DROP statements
                 - Formats the S3 key using the context
+                - Validates the input files and switches the COPY source to the clean set (validate_input=True)
                 - Constructs the COPY command dynamically
                 - Executes the COPY command using Redshift connection
                 - Logs success or failure
+                - Records the distinct partitions of `partition_column` in the staged batch (returned - pushed to XCom)
         """
 
-        redshift = PostgresHook(postgres_conn_id=self.redshift_conn_id)
-
-        # Drop and re-create staging table
-        if self.table == "staging_events":
-            create_sql = final_project_sql_statements.SqlQueries.staging_events_table_create
-        elif self.table == "staging_songs":
-            create_sql = final_project_sql_statements.SqlQueries.staging_songs_table_create
-        else:
-            raise ValueError(f"Unknown staging table: {self.table}")
-
-        self.log.info(f"Dropping and re-creating staging table: {self.table}")
-        redshift.run(create_sql)
+        redshift = get_backend(self.backend, self.redshift_conn_id)
 
         # Use Airflow templating for the S3 key 
         rendered_key = self.s3_key.format(**context)
         s3_path = f"s3://{self.s3_bucket}/{rendered_key}"
         self.log.info(f"Rendered S3 path: {s3_path}")
 
+        if self.validate_input:
+            try:
+                rendered_key, _ = prevalidate_source(
+                    redshift,
+                    self.s3_bucket,
+                    rendered_key,
+                    self.table,
+                    self.log,
+                    aws_conn_id=self.aws_credentials_id,
+                    validated_prefix=self.validated_prefix,
+                    quarantine_prefix=self.quarantine_prefix,
+                    workers=self.validation_workers,
+                    max_quarantined_records=self.max_quarantined_records
+                )
+            except InputValidationError as e:
+                # Bad data will not fix itself - fail without retries
+                raise AirflowFailException(str(e))
+            self.log.info(f"Loading the files listed in the manifest: s3://{self.s3_bucket}/{rendered_key}")
+
         if self.json_path.lower() == "auto":
             json_paths = "auto"
         elif self.json_path.startswith("s3://"):
@@ -115,29 +157,18 @@ class StageToRedshiftOperator(BaseOperator):
             s3_key=rendered_key,
             iam_role=self.iam_role,
             json_path=json_paths,
-            region=self.region
+            region=self.region,
+            manifest="MANIFEST" if self.validate_input else ""
         )
 
-        self.log.info("Executing COPY command on Redshift: {copy_sql}")
-
-        try:
-            redshift.run(copy_sql)
-            self.log.info("COPY command completed successfully.")
-        except Exception as e:
-            self.log.error(f"Error executing COPY command: {e}")
-            raise
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+        self.log.info(f"Executing COPY command on Redshift: {copy_sql}")
 
+        return stage_table(
+            redshift,
+            self.table,
+            rendered_key,
+            copy_sql,
+            self.log,
+            partition_column=self.partition_column,
+            partition_granularity=self.partition_granularity
+        )
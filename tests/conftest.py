@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def duckdb_backend(tmp_path):
+    """
+        In-memory DuckDB backend reading its input files from tmp_path
+    """
+    pytest.importorskip("duckdb")
+    from udacity.common.execution_backend import DuckDBBackend
+
+    backend = DuckDBBackend(database=":memory:", data_root=str(tmp_path))
+    yield backend
+    backend.close()
+
+
+LATE_KEY = "log-data/2018/11/2018-11-15-events.json"
+
+LOGGED_IN_EVENT = {
+    "artist": "Des'ree", "auth": "Logged In", "firstName": "Kaylee", "gender": "F", "itemInSession": 1,
+    "lastName": "Summers", "length": 246.30812, "level": "free", "location": "Phoenix-Mesa-Scottsdale, AZ",
+    "method": "PUT", "page": "NextSong", "registration": 1540344794796.0, "sessionId": 139,
+    "song": "You Gotta Be", "status": 200, "ts": 1541106106796, "userAgent": "Mozilla/5.0", "userId": "8",
+}
+
+LOGGED_OUT_EVENT = {
+    "artist": None, "auth": "Logged Out", "firstName": None, "gender": None, "itemInSession": 0,
+    "lastName": None, "length": None, "level": "free", "location": None, "method": "GET", "page": "Home",
+    "registration": None, "sessionId": 52, "song": None, "status": 200, "ts": 1541207073796, "userAgent": None,
+    "userId": "",
+}
+
+
+@pytest.fixture
+def write_json_lines():
+    """
+        Writes records as newline-delimited JSON, creating the parent directories
+    """
+    def write(path, records):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    return write
+
+
+@pytest.fixture
+def logged_in_event():
+    return dict(LOGGED_IN_EVENT)
+
+
+@pytest.fixture
+def logged_out_event():
+    return dict(LOGGED_OUT_EVENT)
+
+
+@pytest.fixture
+def loaded_backend(duckdb_backend, tmp_path):
+    """
+        DuckDB backend with a small generated dataset fully loaded through the pipeline steps
+    """
+    from benchmarks.generate_data import generate_dataset
+    from benchmarks.run_benchmark import run_pipeline
+
+    generate_dataset(str(tmp_path), scale_factor=0.2, seed=7)
+    run_pipeline(duckdb_backend)
+    return duckdb_backend
+
+
+@pytest.fixture
+def late_key():
+    return LATE_KEY
+
+
+@pytest.fixture
+def restage_late_events(loaded_backend):
+    """
+        Re-stages the LATE_KEY day file alone, as a late-data run does; returns the recorded partitions
+    """
+    from udacity.common.load_steps import stage_table
+
+    def restage():
+        return stage_table(loaded_backend, "staging_events", LATE_KEY, "", logging.getLogger(__name__),
+                           partition_column="ts")
+    return restage
@@ -0,0 +1,52 @@
+import pytest
+
+from udacity.common.execution_backend import rewrite_sql
+from udacity.common.final_project_sql_statements import SqlQueries
+
+
+def test_rewrite_sql_keeps_redshift_statements_unchanged():
+    assert rewrite_sql(SqlQueries.songplay_table_insert, "redshift") == SqlQueries.songplay_table_insert
+
+
+def test_rewrite_sql_translates_epoch_arithmetic_for_duckdb():
+    rewritten = rewrite_sql(SqlQueries.songplay_table_insert, "duckdb")
+    assert "TIMESTAMP 'epoch'" not in rewritten
+    assert "to_seconds(ts // 1000)" in rewritten
+
+
+def test_duckdb_load_staging_turns_empty_string_numerics_into_null(
+        duckdb_backend, tmp_path, write_json_lines, logged_in_event, logged_out_event):
+    write_json_lines(tmp_path / "log-data" / "2018-11-02-events.json", [logged_in_event, logged_out_event])
+
+    duckdb_backend.run(SqlQueries.staging_events_table_create)
+    duckdb_backend.load_staging("staging_events", "log-data", copy_sql="")
+
+    rows = duckdb_backend.get_records("SELECT userid, sessionid, ts, length FROM staging_events ORDER BY ts")
+    assert [row[0] for row in rows] == [8, None]
+    assert [row[1] for row in rows] == [139, 52]
+    assert rows[1][2] == 1541207073796
+    assert float(rows[0][3]) == 246.308
+
+
+@pytest.mark.parametrize("column, value", [("ts", "bad"), ("itemInSession", "one")])
+def test_duckdb_load_staging_fails_on_values_copy_rejects(
+        duckdb_backend, tmp_path, write_json_lines, logged_in_event, column, value):
+    write_json_lines(tmp_path / "log-data" / "2018-11-02-events.json",
+                     [logged_in_event, {**logged_in_event, column: value}])
+
+    duckdb_backend.run(SqlQueries.staging_events_table_create)
+    with pytest.raises(Exception, match="Conversion Error"):
+        duckdb_backend.load_staging("staging_events", "log-data", copy_sql="")
+
+
+def test_duckdb_load_staging_keeps_empty_strings_in_varchar_columns(duckdb_backend, tmp_path, write_json_lines):
+    write_json_lines(tmp_path / "song-data" / "A" / "TRAAA.json", [{
+        "num_songs": 1, "artist_id": "ARJIE2Y1187B994AB7", "artist_latitude": None, "artist_longitude": None,
+        "artist_location": "", "artist_name": "Line Renaud", "song_id": "SOUPIRU12A6D4FA1E1",
+        "title": "Der Kleine Dompfaff", "duration": 152.92036, "year": 0,
+    }])
+
+    duckdb_backend.run(SqlQueries.staging_songs_table_create)
+    duckdb_backend.load_staging("staging_songs", "song-data", copy_sql="")
+
+    assert duckdb_backend.get_records("SELECT artist_location, year FROM staging_songs") == [("", 0)]
@@ -0,0 +1,61 @@
+import json
+import logging
+
+from udacity.common.execution_backend import read_copy_manifest
+from udacity.common.load_steps import prevalidate_source, stage_table
+
+LOG = logging.getLogger(__name__)
+
+
+def test_only_files_with_bad_records_are_rewritten_and_listed_in_the_manifest(
+        duckdb_backend, tmp_path, write_json_lines, logged_in_event, logged_out_event):
+    write_json_lines(tmp_path / "log-data" / "2018-11-01-events.json", [logged_in_event, logged_out_event])
+    write_json_lines(tmp_path / "log-data" / "2018-11-02-events.json", [
+        dict(logged_in_event, ts=1), dict(logged_in_event, ts="bad"), dict(logged_in_event, firstName="Zoë", ts=2),
+    ])
+
+    key, summary = prevalidate_source(duckdb_backend, "", "log-data", "staging_events", LOG, workers=1)
+
+    assert key == "validated/log-data.manifest"
+    assert (summary["valid_records"], summary["quarantined_records"]) == (4, 1)
+    assert sorted(read_copy_manifest(tmp_path / key)) == [
+        "log-data/2018-11-01-events.json",
+        "validated/log-data/2018-11-02-events.json",
+    ]
+    assert not (tmp_path / "validated" / "log-data" / "2018-11-01-events.json").exists()
+
+    quarantined = json.loads((tmp_path / "quarantine" / "log-data" / "2018-11-02-events.json.errors.json").read_text())
+    assert quarantined["line"] == 2 and quarantined["errors"] == ["ts: 'bad' is not a number"]
+
+    stage_table(duckdb_backend, "staging_events", key, "", LOG)
+    assert duckdb_backend.get_records("SELECT COUNT(*) FROM staging_events")[0][0] == 4
+
+
+def test_invalid_utf8_is_replaced_like_acceptinvchars(duckdb_backend, tmp_path, logged_in_event):
+    dirty_file = tmp_path / "log-data" / "2018-11-02-events.json"
+    dirty_file.parent.mkdir(parents=True)
+    dirty_file.write_bytes(json.dumps(dict(logged_in_event, ts=1)).encode("utf-8").replace(b"Kaylee", b"Kayl\xe9e") +
+                           b"\n" + json.dumps(dict(logged_in_event, ts=None)).encode("utf-8") + b"\n")
+
+    key, summary = prevalidate_source(duckdb_backend, "", "log-data", "staging_events", LOG, workers=1)
+
+    assert (summary["valid_records"], summary["quarantined_records"]) == (1, 1)
+    stage_table(duckdb_backend, "staging_events", key, "", LOG)
+    assert duckdb_backend.get_records("SELECT firstname FROM staging_events") == [("Kayl?e",)]
+
+
+def test_objects_spanning_several_lines_are_valid(duckdb_backend, tmp_path):
+    pretty_file = tmp_path / "song-data" / "A" / "TRAAA.json"
+    pretty_file.parent.mkdir(parents=True)
+    song = {"num_songs": 1, "artist_id": "ARJIE2Y1187B994AB7", "artist_latitude": None, "artist_longitude": None,
+            "artist_location": "", "artist_name": "Line Renaud", "song_id": "SOUPIRU12A6D4FA1E1",
+            "title": "Der Kleine Dompfaff", "duration": 152.92036, "year": 0}
+    pretty_file.write_text(json.dumps(song, indent=2) + "\n" + json.dumps(dict(song, song_id="SOB")) + "\n")
+
+    key, summary = prevalidate_source(duckdb_backend, "", "song-data", "staging_songs", LOG, workers=1)
+
+    assert (summary["valid_records"], summary["quarantined_records"], summary["rewritten_files"]) == (2, 0, [])
+    stage_table(duckdb_backend, "staging_songs", key, "", LOG)
+    assert duckdb_backend.get_records("SELECT song_id FROM staging_songs ORDER BY song_id") == [
+        ("SOB",), ("SOUPIRU12A6D4FA1E1",)
+    ]
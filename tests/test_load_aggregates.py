@@ -0,0 +1,38 @@
+import logging
+
+import pytest
+
+from udacity.common.final_project_sql_statements import SqlQueries
+from udacity.common.load_steps import load_aggregate, load_fact, verify_aggregate
+
+LOG = logging.getLogger(__name__)
+
+AGGREGATES = [
+    ("songplay_hourly_level", SqlQueries.songplay_hourly_level_insert),
+    ("songplay_hourly_artist", SqlQueries.songplay_hourly_artist_insert),
+]
+
+
+@pytest.mark.parametrize("target_table, sql_query", AGGREGATES)
+def test_partition_merge_matches_a_full_recompute(loaded_backend, restage_late_events, target_table, sql_query):
+    load_aggregate(loaded_backend, target_table, sql_query, LOG, full_refresh=True, verify=True)
+
+    # Change the songplay rows of the late partitions: drop some plays, switch the level of the others
+    partitions = restage_late_events()
+    loaded_backend.run("DELETE FROM staging_events WHERE itemInSession % 3 = 0")
+    loaded_backend.run("UPDATE staging_events SET level = CASE WHEN level = 'free' THEN 'paid' ELSE 'free' END")
+    load_fact(loaded_backend, "songplay", SqlQueries.songplay_table_insert, LOG, partitions=partitions)
+
+    before = loaded_backend.get_records(f"SELECT * FROM {target_table} ORDER BY ALL")
+    load_aggregate(loaded_backend, target_table, sql_query, LOG, partitions=partitions, verify=True)
+
+    assert loaded_backend.get_records(f"SELECT * FROM {target_table} ORDER BY ALL") != before
+
+
+def test_verify_detects_duplicated_rows(loaded_backend):
+    target_table, sql_query = AGGREGATES[0]
+    load_aggregate(loaded_backend, target_table, sql_query, LOG, full_refresh=True)
+    loaded_backend.run(f"INSERT INTO {target_table} SELECT * FROM {target_table} LIMIT 1")
+
+    with pytest.raises(ValueError, match="duplicated rows"):
+        verify_aggregate(loaded_backend, target_table, sql_query, LOG)
@@ -0,0 +1,61 @@
+import logging
+
+from benchmarks.run_benchmark import run_phase
+from udacity.common.final_project_sql_statements import SqlQueries
+from udacity.common.load_steps import load_dimension
+
+LOG = logging.getLogger(__name__)
+
+
+def rows(backend, table):
+    return sorted(backend.get_records(f"SELECT * FROM {table}"), key=repr)
+
+
+def test_merging_an_unchanged_day_keeps_user_info_equal_to_a_full_rebuild(loaded_backend, restage_late_events):
+    full_rebuild = rows(loaded_backend, "user_info")
+    partitions = restage_late_events()
+
+    load_dimension(loaded_backend, "user_info", SqlQueries.user_table_insert, LOG, partitions=partitions, merge=True)
+
+    assert rows(loaded_backend, "user_info") == full_rebuild
+
+
+def test_merging_a_late_day_adds_its_new_rows_only(loaded_backend, restage_late_events):
+    rows_before = rows(loaded_backend, "user_info")
+    partitions = restage_late_events()
+    loaded_backend.run("UPDATE staging_events SET lastname = 'Renamed' WHERE page = 'NextSong'")
+
+    load_dimension(loaded_backend, "user_info", SqlQueries.user_table_insert, LOG, partitions=partitions, merge=True)
+
+    batch_users = loaded_backend.get_records(
+        "SELECT COUNT(DISTINCT userid) FROM staging_events WHERE page = 'NextSong'"
+    )[0][0]
+    renamed = loaded_backend.get_records("SELECT COUNT(DISTINCT userid) FROM user_info WHERE lastname = 'Renamed'")
+    assert renamed[0][0] == batch_users
+    assert set(rows_before) <= set(rows(loaded_backend, "user_info"))
+
+
+def test_empty_batch_leaves_user_info_unchanged(loaded_backend):
+    rows_before = rows(loaded_backend, "user_info")
+
+    load_dimension(loaded_backend, "user_info", SqlQueries.user_table_insert, LOG, partitions=[], merge=True)
+
+    assert rows(loaded_backend, "user_info") == rows_before
+
+
+def test_partition_run_without_merge_rebuilds_only_the_partitions(loaded_backend, restage_late_events):
+    full_rebuild = rows(loaded_backend, "time")
+    partitions = restage_late_events()
+
+    load_dimension(loaded_backend, "time", SqlQueries.time_table_insert, LOG, partitions=partitions)
+
+    assert rows(loaded_backend, "time") == full_rebuild
+
+
+def test_late_phase_of_the_pipeline_matches_a_full_rebuild(loaded_backend, late_key):
+    tables = ["songplay", "user_info", "song", "artist", "time"]
+    full_rebuild = {table: rows(loaded_backend, table) for table in tables}
+
+    run_phase(loaded_backend, "late_", late_key, partitioned=True)
+
+    assert {table: rows(loaded_backend, table) for table in tables} == full_rebuild
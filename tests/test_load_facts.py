@@ -0,0 +1,50 @@
+import logging
+from datetime import datetime, timezone
+
+from udacity.common.final_project_sql_statements import SqlQueries
+from udacity.common.load_steps import load_fact, stage_table
+
+LOG = logging.getLogger(__name__)
+
+
+def epoch_ms(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def test_stage_table_records_the_hours_of_the_batch(
+        duckdb_backend, tmp_path, write_json_lines, logged_in_event, logged_out_event):
+    write_json_lines(tmp_path / "log-data" / "2018-11-15-events.json", [
+        {**logged_in_event, "ts": epoch_ms(2018, 11, 15, 1, 59)},
+        {**logged_in_event, "ts": epoch_ms(2018, 11, 15, 1, 5)},
+        {**logged_out_event, "ts": epoch_ms(2018, 11, 15, 23, 0)},
+    ])
+
+    partitions = stage_table(duckdb_backend, "staging_events", "log-data", "", LOG, partition_column="ts")
+
+    assert partitions == ["2018-11-15 01:00:00", "2018-11-15 23:00:00"]
+    assert stage_table(duckdb_backend, "staging_events", "log-data", "", LOG) is None
+
+
+def test_partition_load_rebuilds_only_the_staged_hours(loaded_backend, restage_late_events):
+    loaded_backend.run("UPDATE songplay SET location = 'stale'")
+    partitions = restage_late_events()
+
+    load_fact(loaded_backend, "songplay", SqlQueries.songplay_table_insert, LOG, partitions=partitions)
+
+    stale_days = {row[0] for row in loaded_backend.get_records(
+        "SELECT DISTINCT CAST(start_time AS DATE) FROM songplay WHERE location = 'stale'"
+    )}
+    rebuilt_hours = {row[0].strftime("%Y-%m-%d %H:%M:%S") for row in loaded_backend.get_records(
+        "SELECT DISTINCT date_trunc('hour', start_time) FROM songplay WHERE location <> 'stale'"
+    )}
+    assert rebuilt_hours and rebuilt_hours <= set(partitions)
+    assert "2018-11-15" not in {day.isoformat() for day in stale_days}
+    assert len(stale_days) > 1
+
+
+def test_empty_partition_list_leaves_the_fact_table_unchanged(loaded_backend):
+    rows_before = loaded_backend.get_records("SELECT COUNT(*) FROM songplay")
+
+    load_fact(loaded_backend, "songplay", SqlQueries.songplay_table_insert, LOG, partitions=[])
+
+    assert loaded_backend.get_records("SELECT COUNT(*) FROM songplay") == rows_before
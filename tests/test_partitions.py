@@ -0,0 +1,39 @@
+import pytest
+
+from udacity.common.partitions import partition_predicate, render_partition_filter
+
+
+def test_none_selects_every_partition():
+    assert partition_predicate("start_time", None) == "1 = 1"
+
+
+def test_empty_list_selects_nothing():
+    assert partition_predicate("start_time", []) == "1 = 0"
+
+
+def test_adjacent_hours_are_merged_into_one_range():
+    predicate = partition_predicate(
+        "start_time", ["2018-11-15 02:00:00", "2018-11-15 00:00:00", "2018-11-15 01:00:00", "2018-11-15 05:00:00"]
+    )
+
+    assert predicate == ("((start_time >= '2018-11-15 00:00:00' AND start_time < '2018-11-15 03:00:00') OR "
+                         "(start_time >= '2018-11-15 05:00:00' AND start_time < '2018-11-15 06:00:00'))")
+
+
+def test_day_partitions_cover_whole_days():
+    predicate = partition_predicate("start_time", ["2018-11-15 00:00:00", "2018-11-16 00:00:00"], "day")
+
+    assert predicate == "((start_time >= '2018-11-15 00:00:00' AND start_time < '2018-11-17 00:00:00'))"
+
+
+def test_unknown_granularity_is_rejected():
+    with pytest.raises(ValueError):
+        partition_predicate("start_time", ["2018-11-15 00:00:00"], "week")
+
+
+def test_render_partition_filter_replaces_the_placeholder():
+    sql = "SELECT COUNT(*) FROM time WHERE start_time IS NULL AND {partition_filter}"
+
+    assert render_partition_filter(sql, "start_time", None) == (
+        "SELECT COUNT(*) FROM time WHERE start_time IS NULL AND 1 = 1"
+    )
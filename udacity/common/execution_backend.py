@@ -0,0 +1,408 @@
+import csv
+import glob
+import json
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from udacity.common.input_validation import split_json_records
+
+"""
+    Purpose of the script:
+        - Provide pluggable execution backends so the same operators and SqlQueries can run against Redshift,
+          a local Postgres or an in-process DuckDB database.
+
+    Inputs:
+        - Backend name passed to the operators (`backend=`) or the PIPELINE_EXECUTION_BACKEND environment variable
+          ("redshift" - default, "postgres" or "duckdb")
+        - PIPELINE_LOCAL_DATA_ROOT: local directory which replaces the S3 bucket for the local backends
+          (e.g. ~ when the data was copied with `aws s3 cp` as described in the README)
+        - PIPELINE_DUCKDB_PATH: DuckDB database file shared by all the tasks (default: pipeline.duckdb)
+
+    Outputs:
+        - get_backend() returns an object with run(), get_records() and load_staging() methods used by the operators,
+          plus fetch_source_files()/publish_files() to pre-validate the input files locally before the load
+        - COPY manifests (write_copy_manifest) listing the files to load - the local backends load the files
+          listed in a manifest when the source key points to one
+
+    Functionality:
+        - RedshiftBackend: PostgresHook + the COPY command built by StageToRedshiftOperator (unchanged behaviour)
+        - PostgresBackend: PostgresHook, SQL rewritten to the Postgres dialect, COPY translated to COPY FROM STDIN
+          of the local JSON files
+        - DuckDBBackend: in-process DuckDB, SQL rewritten to the DuckDB dialect, COPY translated to
+          read_json_auto/read_parquet bulk reads of the local files
+        - Provider imports (PostgresHook, duckdb) happen only when a backend is used, not on import
+"""
+
+DEFAULT_BACKEND = "redshift"
+MANIFEST_SUFFIX = ".manifest"
+# Parallel S3 downloads/uploads of the pre-validation
+S3_TRANSFER_WORKERS = 16
+
+
+def _cast_concat_to_varchar(match):
+    return f"md5(CAST({match.group(1)} AS VARCHAR) || CAST({match.group(2)} AS VARCHAR))"
+
+
+# (pattern, replacement) pairs applied in order to every statement for a local dialect
+_COMMON_REWRITES = [
+    # Redshift casts the operands of || to varchar implicitly, Postgres/DuckDB do not
+    (re.compile(r"md5\(\s*([\w.]+)\s*\|\|\s*([\w.]+)\s*\)", re.IGNORECASE), _cast_concat_to_varchar),
+    # Redshift-only alias for the day of week date part
+    (re.compile(r"extract\(\s*dayofweek\s+from", re.IGNORECASE), "extract(dow from"),
+    # Redshift does not enforce PRIMARY KEY constraints (duplicated user levels are allowed there)
+    (re.compile(r"\s+PRIMARY\s+KEY", re.IGNORECASE), ""),
+]
+
+SQL_REWRITES = {
+    "redshift": [],
+    "postgres": _COMMON_REWRITES,
+    "duckdb": _COMMON_REWRITES + [
+        # DuckDB has no 'epoch' timestamp literal and divides integers as floats
+        (re.compile(r"TIMESTAMP\s+'epoch'\s*\+\s*([\w.]+)\s*/\s*1000\s*\*\s*interval\s+'1 second'", re.IGNORECASE),
+         r"(TIMESTAMP '1970-01-01 00:00:00' + to_seconds(\1 // 1000))"),
+        # Default DuckDB schema is `main`
+        (re.compile(r"table_schema\s*=\s*'public'", re.IGNORECASE), "table_schema = 'main'"),
+    ],
+}
+
+
+def rewrite_sql(sql, dialect):
+    """
+        Purpose of the function:
+            - Translate a Redshift SQL statement to the dialect of the target backend
+        Input:
+            - sql: SQL statement written for Redshift (e.g. from SqlQueries)
+            - dialect: "redshift", "postgres" or "duckdb"
+        Output:
+            - SQL statement runnable on the target backend
+    """
+    for pattern, replacement in SQL_REWRITES[dialect]:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def manifest_key(prefix, source_key):
+    """
+        Purpose of the function:
+            - Key of the COPY manifest written for the pre-validated files of source_key
+    """
+    return f"{prefix}/{source_key.rstrip('/')}{MANIFEST_SUFFIX}"
+
+
+def write_copy_manifest(path, bucket, keys):
+    """
+        Purpose of the function:
+            - Write a Redshift COPY manifest (COPY ... MANIFEST) listing s3://<bucket>/<key> for every key
+        Input:
+            - path: local manifest file
+            - bucket: S3 bucket of the files
+            - keys: S3 keys of the files to load
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as manifest_file:
+        json.dump({"entries": [{"url": f"s3://{bucket}/{key}", "mandatory": True} for key in keys]}, manifest_file)
+
+
+def read_copy_manifest(path):
+    """
+        Purpose of the function:
+            - Read the keys listed in a COPY manifest (the bucket part of the URLs is dropped)
+        Output:
+            - List of S3 keys
+    """
+    with open(path, encoding="utf-8") as manifest_file:
+        entries = json.load(manifest_file)["entries"]
+    return [entry["url"][len("s3://"):].split("/", 1)[1] for entry in entries]
+
+
+def list_source_files(data_root, source_key, extensions=(".json", ".parquet")):
+    """
+        Purpose of the function:
+            - Resolve the local files which replace s3://<bucket>/<source_key> for the local backends
+        Input:
+            - data_root: local directory used instead of the S3 bucket
+            - source_key: rendered S3 key (file, prefix or COPY manifest)
+            - extensions: file extensions to pick up
+        Output:
+            - Sorted list of file paths, raises ValueError if nothing is found
+    """
+    path = os.path.join(os.path.expanduser(data_root), source_key)
+    if source_key.endswith(MANIFEST_SUFFIX) and os.path.isfile(path):
+        files = sorted(os.path.join(os.path.expanduser(data_root), key) for key in read_copy_manifest(path))
+    elif os.path.isfile(path):
+        files = [path]
+    else:
+        files = sorted(
+            file for file in glob.glob(os.path.join(path, "**", "*"), recursive=True)
+            if file.lower().endswith(extensions)
+        )
+
+    if not files:
+        raise ValueError(f"No input files found under {path}")
+    return files
+
+
+def iter_json_records(path):
+    """
+        Purpose of the function:
+            - Read the records of a local JSON file - one object per line (as log-data and song-data) or objects
+              spanning several lines, as COPY JSON accepts
+        Input:
+            - path: local JSON file
+        Output:
+            - Generator of dictionaries, raises ValueError on invalid JSON
+    """
+    with open(path, encoding="utf-8") as json_file:
+        text = json_file.read()
+    for line_number, _, value, error in split_json_records(text):
+        if error:
+            raise ValueError(f"{path}, line {line_number}: {error}")
+        yield value
+
+
+def get_backend(backend=None, conn_id=""):
+    """
+        Purpose of the function:
+            - Build the execution backend used by the operators
+        Input:
+            - backend: "redshift", "postgres" or "duckdb"; falls back to PIPELINE_EXECUTION_BACKEND, then "redshift"
+            - conn_id: Airflow connection ID (used by the Redshift and Postgres backends)
+        Output:
+            - Backend instance
+    """
+    name = (backend or os.environ.get("PIPELINE_EXECUTION_BACKEND") or DEFAULT_BACKEND).lower()
+
+    if name == "redshift":
+        return RedshiftBackend(conn_id)
+    elif name == "postgres":
+        return PostgresBackend(conn_id)
+    elif name == "duckdb":
+        return DuckDBBackend()
+    else:
+        raise ValueError(f"Unknown execution backend: {name}")
+
+
+class RedshiftBackend:
+    """
+        Purpose of the class:
+            - Run the pipeline SQL on Redshift through PostgresHook, exactly as written in SqlQueries
+    """
+
+    dialect = "redshift"
+
+    def __init__(self, conn_id=""):
+        self.conn_id = conn_id
+        self._hook = None
+
+    @property
+    def hook(self):
+        if self._hook is None:
+            from airflow.hooks.postgres_hook import PostgresHook
+            self._hook = PostgresHook(postgres_conn_id=self.conn_id)
+        return self._hook
+
+    def run(self, sql):
+        self.hook.run(rewrite_sql(sql, self.dialect))
+
+    def get_records(self, sql):
+        return self.hook.get_records(rewrite_sql(sql, self.dialect))
+
+    def load_staging(self, table, source_key, copy_sql):
+        """
+            Purpose of the function:
+                - Load the staging table with the COPY command built by StageToRedshiftOperator
+        """
+        self.run(copy_sql)
+
+    def fetch_source_files(self, bucket, source_key, local_dir, aws_conn_id=""):
+        """
+            Purpose of the function:
+                - Download s3://<bucket>/<source_key> to local_dir (local_dir/<key> for every key),
+                  S3_TRANSFER_WORKERS files at a time
+            Output:
+                - (local root standing for the bucket, list of local file paths)
+        """
+        from airflow.providers.amazon.aws.hooks.s3 import S3Hook
+        s3 = S3Hook(aws_conn_id=aws_conn_id)
+        client = s3.get_conn()
+
+        keys = [key for key in s3.list_keys(bucket_name=bucket, prefix=source_key) or [] if not key.endswith("/")]
+        if not keys:
+            raise ValueError(f"No input files found under s3://{bucket}/{source_key}")
+
+        def download(key):
+            path = os.path.join(local_dir, key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            client.download_file(bucket, key, path)
+            return path
+
+        with ThreadPoolExecutor(max_workers=S3_TRANSFER_WORKERS) as executor:
+            files = list(executor.map(download, keys))
+        return local_dir, files
+
+    def publish_files(self, bucket, local_dir, prefix, source_key, aws_conn_id=""):
+        """
+            Purpose of the function:
+                - Upload the files of local_dir to s3://<bucket>/<prefix>/<relative path>, replacing the previous
+                  upload of s3://<bucket>/<prefix>/<source_key>, S3_TRANSFER_WORKERS files at a time
+        """
+        from airflow.providers.amazon.aws.hooks.s3 import S3Hook
+        s3 = S3Hook(aws_conn_id=aws_conn_id)
+        client = s3.get_conn()
+
+        previous_keys = s3.list_keys(bucket_name=bucket, prefix=f"{prefix}/{source_key.rstrip('/')}") or []
+        if previous_keys:
+            s3.delete_objects(bucket, previous_keys)
+
+        paths = [os.path.join(root, name) for root, _, names in os.walk(local_dir) for name in names]
+
+        def upload(path):
+            key = f"{prefix}/{os.path.relpath(path, local_dir)}".replace(os.sep, "/")
+            client.upload_file(path, bucket, key)
+
+        with ThreadPoolExecutor(max_workers=S3_TRANSFER_WORKERS) as executor:
+            list(executor.map(upload, paths))
+
+
+class LocalFilesMixin:
+    """
+        Purpose of the class:
+            - Source file handling of the local backends - PIPELINE_LOCAL_DATA_ROOT replaces the S3 bucket
+    """
+
+    def fetch_source_files(self, bucket, source_key, local_dir, aws_conn_id=""):
+        return os.path.expanduser(self.data_root), list_source_files(self.data_root, source_key, extensions=(".json",))
+
+    def publish_files(self, bucket, local_dir, prefix, source_key, aws_conn_id=""):
+        target_dir = os.path.join(os.path.expanduser(self.data_root), prefix)
+        previous = os.path.join(target_dir, source_key.rstrip("/"))
+        for path in (previous, previous + MANIFEST_SUFFIX):
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+        shutil.copytree(local_dir, target_dir, dirs_exist_ok=True)
+
+
+class PostgresBackend(LocalFilesMixin, RedshiftBackend):
+    """
+        Purpose of the class:
+            - Run the pipeline SQL on a local Postgres (conn_id points to it)
+            - Replace the S3 COPY with COPY FROM STDIN of the local JSON files under PIPELINE_LOCAL_DATA_ROOT
+    """
+
+    dialect = "postgres"
+
+    def __init__(self, conn_id="", data_root=None):
+        super(PostgresBackend, self).__init__(conn_id)
+        self.data_root = data_root or os.environ.get("PIPELINE_LOCAL_DATA_ROOT", ".")
+
+    def load_staging(self, table, source_key, copy_sql):
+        """
+            Purpose of the function:
+                - Bulk load local JSON files into a staging table
+            Functionality:
+                - Reads the staging table columns from information_schema
+                - Matches JSON keys to the columns case-insensitively (same as the log_json_path.json mapping)
+                - Writes the records to a temporary CSV file and loads it with COPY ... FROM STDIN
+        """
+        columns = [row[0] for row in self.get_records(f"""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_schema = 'public'
+            AND table_name = '{table}'
+            ORDER BY ordinal_position;
+        """)]
+
+        files = list_source_files(self.data_root, source_key, extensions=(".json",))
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", encoding="utf-8") as csv_file:
+            writer = csv.writer(csv_file)
+            for path in files:
+                for record in iter_json_records(path):
+                    record = {key.lower(): value for key, value in record.items()}
+                    writer.writerow(["" if record.get(column) is None else record.get(column) for column in columns])
+            csv_file.flush()
+
+            self.hook.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '')",
+                csv_file.name
+            )
+
+
+class DuckDBBackend(LocalFilesMixin):
+    """
+        Purpose of the class:
+            - Run the pipeline SQL in an in-process DuckDB database
+            - Replace the S3 COPY with native read_json_auto/read_parquet reads of the local files
+        Inputs:
+            - database: DuckDB file shared by all tasks (PIPELINE_DUCKDB_PATH, default pipeline.duckdb) or ":memory:"
+            - data_root: local directory used instead of the S3 bucket (PIPELINE_LOCAL_DATA_ROOT)
+    """
+
+    dialect = "duckdb"
+
+    def __init__(self, database=None, data_root=None):
+        self.database = database or os.environ.get("PIPELINE_DUCKDB_PATH", "pipeline.duckdb")
+        self.data_root = data_root or os.environ.get("PIPELINE_LOCAL_DATA_ROOT", ".")
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            import duckdb
+            self._connection = duckdb.connect(self.database)
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def run(self, sql):
+        self.connection.execute(rewrite_sql(sql, self.dialect))
+
+    def get_records(self, sql):
+        return self.connection.execute(rewrite_sql(sql, self.dialect)).fetchall()
+
+    def load_staging(self, table, source_key, copy_sql):
+        """
+            Purpose of the function:
+                - Bulk load local JSON/Parquet files into a staging table
+            Functionality:
+                - Builds a read_json_auto (or read_parquet) scan over all the files
+                - Matches source columns to the table columns case-insensitively
+                - Casts every source column to the table column type; empty strings become NULL in non-varchar
+                  columns (e.g. "userId": "" of logged-out events), like COPY does on Redshift, and any other
+                  value which does not convert (e.g. "ts": "bad") fails the load, as COPY does
+                - Runs a single INSERT INTO ... SELECT over the scan
+        """
+        files = list_source_files(self.data_root, source_key)
+        file_list = ", ".join("'" + file.replace("'", "''") + "'" for file in files)
+
+        if all(file.lower().endswith(".parquet") for file in files):
+            scan = f"read_parquet([{file_list}], union_by_name = true)"
+        else:
+            # format = 'auto' also reads objects spanning several lines, as COPY JSON does
+            scan = f"read_json_auto([{file_list}], format = 'auto', union_by_name = true)"
+
+        source_columns = {row[0].lower(): row[0] for row in self.get_records(f"DESCRIBE SELECT * FROM {scan}")}
+        table_columns = [(row[0], row[1]) for row in self.get_records(f"DESCRIBE {table}")]
+        columns = [(column, column_type) for column, column_type in table_columns if column.lower() in source_columns]
+
+        casts = []
+        for column, column_type in columns:
+            source = f'"{source_columns[column.lower()]}"'
+            if column_type.upper().startswith("VARCHAR"):
+                casts.append(f"CAST({source} AS {column_type})")
+            else:
+                casts.append(f"CAST(NULLIF(TRIM(CAST({source} AS VARCHAR)), '') AS {column_type})")
+
+        self.run(f"""
+            INSERT INTO {table} ({', '.join(column for column, _ in columns)})
+            SELECT {', '.join(casts)}
+            FROM {scan}
+        """)
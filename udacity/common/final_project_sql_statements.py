@@ -181,7 +181,66 @@ class SqlQueries:
     """)
 
     time_table_insert = ("""
-        SELECT start_time, extract(hour from start_time), extract(day from start_time), extract(week from start_time), 
-               extract(month from start_time), extract(year from start_time), extract(dayofweek from start_time)
+        SELECT start_time, extract(hour from start_time) AS hour, extract(day from start_time) AS day,
+               extract(week from start_time) AS week, extract(month from start_time) AS month,
+               extract(year from start_time) AS year, extract(dayofweek from start_time) AS weekday
         FROM songplay
-    """)
\ No newline at end of file
+    """)
+
+    """
+        DATA QUALITY CHECKS
+        (query, expected result) pairs used by the DataQualityOperator - no NULL ids in the fact and dimension tables
+        {partition_filter} is replaced with the start_time range of the reprocessed partitions (or 1 = 1)
+    """
+    data_quality_checks = [
+        ("SELECT COUNT(*) FROM songplay WHERE songplay_id IS NULL AND {partition_filter}", 0),
+        ("SELECT COUNT(*) FROM user_info WHERE userid IS NULL", 0),
+        ("SELECT COUNT(*) FROM song WHERE song_id IS NULL", 0),
+        ("SELECT COUNT(*) FROM artist WHERE artist_id IS NULL", 0),
+        ("SELECT COUNT(*) FROM time WHERE start_time IS NULL AND {partition_filter}", 0)
+    ]
+
+    """
+        AGGREGATE TABLES
+        Summary tables downstream of songplay, maintained by the LoadAggregateOperator
+            - Grain always includes the start hour, so a reprocessed partition replaces exactly its own aggregate rows
+            - Dashboards roll `plays` up from the small hourly tables (per day, per level, per artist) instead of
+              scanning songplay
+            - `users` is the number of distinct users within the hour and row: it can not be summed across hours,
+              levels or artists (a user active in several hours would be counted several times) - distinct users
+              over a longer period are counted on songplay, filtered on start_time
+            - {partition_filter} is replaced with the start_time range of the reprocessed partitions (or 1 = 1)
+    """
+    songplay_hourly_level_table_create = ("""
+        CREATE TABLE songplay_hourly_level (
+            start_hour timestamp NOT NULL,
+            level varchar(50),
+            plays bigint,
+            users bigint
+        );
+    """)
+
+    songplay_hourly_artist_table_create = ("""
+        CREATE TABLE songplay_hourly_artist (
+            start_hour timestamp NOT NULL,
+            artist_id varchar(500),
+            plays bigint,
+            users bigint
+        );
+    """)
+
+    songplay_hourly_level_insert = ("""
+        SELECT date_trunc('hour', songplay.start_time) AS start_hour, songplay.level,
+               COUNT(*) AS plays, COUNT(DISTINCT songplay.userid) AS users
+        FROM songplay
+        WHERE {partition_filter}
+        GROUP BY 1, 2
+    """)
+
+    songplay_hourly_artist_insert = ("""
+        SELECT date_trunc('hour', songplay.start_time) AS start_hour, songplay.artist_id,
+               COUNT(*) AS plays, COUNT(DISTINCT songplay.userid) AS users
+        FROM songplay
+        WHERE {partition_filter}
+        GROUP BY 1, 2
+    """)
@@ -0,0 +1,259 @@
+import codecs
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from udacity.common.final_project_sql_statements import SqlQueries
+
+"""
+    Purpose of the script:
+        - Pre-flight validation of the JSON input files before COPY, so a single malformed or oversized record
+          is quarantined locally instead of failing (and retrying) the whole load on the cluster.
+
+    Inputs:
+        - Local JSON files - a sequence of JSON objects separated by whitespace, one per line (as log-data and
+          song-data) or spanning several lines, as Redshift COPY JSON accepts
+        - Staging table name - the schema is read from the CREATE statements in SqlQueries
+        - Required columns per staging table (REQUIRED_COLUMNS)
+
+    Outputs:
+        - Clean copies (same relative paths as the inputs) of the files which had bad lines only - the other files
+          are loaded as they are, so only the rewritten files have to be uploaded again
+        - Quarantine files <file>.errors.json with, per bad record, the line number, the errors and the original text
+        - Summary dictionary with the number of files, valid and quarantined records and the files to load
+
+    Functionality:
+        - Files are validated in parallel in a process pool (one task per file)
+        - Invalid UTF-8 bytes are replaced with '?' before validation, as COPY does with ACCEPTINVCHARS AS '?'
+          (the loading policy in SqlQueries) - such records are loaded, not quarantined, and the varchar byte
+          lengths are checked on the text COPY loads
+        - Records are split with a JSON decoder, not per line; text which does not parse is quarantined up to the
+          end of its line and the validation resumes on the next line
+        - Record keys are matched to the columns case-insensitively (same as the log_json_path.json mapping)
+        - Checks: valid JSON object, required columns present, int/bigint ranges, numeric precision,
+          varchar length in bytes (Redshift varchar lengths are bytes)
+"""
+
+REQUIRED_COLUMNS = {
+    "staging_events": ["ts"],
+    "staging_songs": ["song_id"],
+}
+
+INTEGER_RANGES = {
+    "int": (-2 ** 31, 2 ** 31 - 1),
+    "bigint": (-2 ** 63, 2 ** 63 - 1),
+}
+
+# Same replacement as COPY ... ACCEPTINVCHARS AS '?' - one '?' per invalid byte
+INVALID_CHARS_REPLACEMENT = "?"
+codecs.register_error("copy_acceptinvchars",
+                      lambda error: (INVALID_CHARS_REPLACEMENT * (error.end - error.start), error.end))
+
+_CREATE_TABLE_RE = re.compile(r"CREATE TABLE\s+(\w+)\s*\((.*?)\);", re.IGNORECASE | re.DOTALL)
+_COLUMN_RE = re.compile(r"^\s*(\w+)\s+(varchar|bigint|int|numeric)\s*(?:\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\))?",
+                        re.IGNORECASE)
+
+
+def staging_schema(table):
+    """
+        Purpose of the function:
+            - Read the column types of a staging table from its CREATE statement in SqlQueries
+        Input:
+            - table: "staging_events" or "staging_songs"
+        Output:
+            - Dictionary column -> (type, length/precision, scale)
+    """
+    if table == "staging_events":
+        create_sql = SqlQueries.staging_events_table_create
+    elif table == "staging_songs":
+        create_sql = SqlQueries.staging_songs_table_create
+    else:
+        raise ValueError(f"Unknown staging table: {table}")
+
+    body = _CREATE_TABLE_RE.search(create_sql).group(2)
+    schema = {}
+    for definition in body.splitlines():
+        match = _COLUMN_RE.match(definition)
+        if match:
+            name, column_type, size, scale = match.groups()
+            schema[name.lower()] = (column_type.lower(), int(size) if size else None, int(scale) if scale else 0)
+    return schema
+
+
+def _is_null(value):
+    return value is None or value == ""
+
+
+def validate_value(value, column_type, size, scale):
+    """
+        Purpose of the function:
+            - Check that COPY can load a JSON value into a column
+        Input:
+            - value: JSON value
+            - column_type, size, scale: column definition from staging_schema()
+        Output:
+            - Error message, or None if the value is valid
+    """
+    if _is_null(value):
+        return None
+
+    if column_type == "varchar":
+        if isinstance(value, (dict, list)):
+            return f"expected a string, got {type(value).__name__}"
+        length = len(str(value).encode("utf-8"))
+        if size is not None and length > size:
+            return f"{length} bytes exceeds varchar({size})"
+        return None
+
+    if isinstance(value, (bool, dict, list)):
+        return f"expected a number, got {type(value).__name__}"
+
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        return f"{value!r} is not a number"
+    if not number.is_finite():
+        return f"{value!r} is not a finite number"
+
+    if column_type in INTEGER_RANGES:
+        if number != number.to_integral_value():
+            return f"{value!r} is not an integer"
+        low, high = INTEGER_RANGES[column_type]
+        if not low <= number <= high:
+            return f"{value!r} is out of range for {column_type}"
+    elif size is not None:
+        integer_digits = len(str(abs(int(number)))) if abs(number) >= 1 else 0
+        if integer_digits > size - scale:
+            return f"{value!r} does not fit numeric({size}, {scale})"
+    return None
+
+
+def split_json_records(text):
+    """
+        Purpose of the function:
+            - Split the decoded content of a JSON file into its records, the way COPY JSON reads it
+        Input:
+            - text: file content
+        Output:
+            - Generator of (line number, record text, parsed value or None if the text is not valid JSON, JSON error)
+    """
+    decoder = json.JSONDecoder()
+    position, length = 0, len(text)
+    line_number, counted_to = 1, 0
+    while True:
+        while position < length and text[position].isspace():
+            position += 1
+        if position >= length:
+            return
+        line_number += text.count("\n", counted_to, position)
+        counted_to = position
+        try:
+            value, end = decoder.raw_decode(text, position)
+        except ValueError as e:
+            # Skip the rest of the line and resume on the next one
+            end = text.find("\n", position)
+            end = length if end == -1 else end
+            yield line_number, text[position:end], None, f"invalid JSON: {e}"
+        else:
+            yield line_number, text[position:end], value, None
+        position = end
+
+
+def validate_record(value, schema, required_columns):
+    """
+        Purpose of the function:
+            - Validate one parsed JSON value against the staging schema
+        Output:
+            - List of error messages (empty if the record is valid)
+    """
+    if not isinstance(value, dict):
+        return ["record is not a JSON object"]
+
+    record = {key.lower(): field for key, field in value.items()}
+    errors = [f"{column}: required value is missing" for column in required_columns if _is_null(record.get(column))]
+
+    for column, (column_type, size, scale) in schema.items():
+        error = validate_value(record.get(column), column_type, size, scale)
+        if error:
+            errors.append(f"{column}: {error}")
+    return errors
+
+
+def validate_file(path, input_root, clean_dir, quarantine_dir, table):
+    """
+        Purpose of the function:
+            - Split one input file into its clean records and its quarantined records (runs in a worker process)
+        Input:
+            - path: input file
+            - input_root: root the relative output paths are computed from
+            - clean_dir, quarantine_dir: output directories
+            - table: staging table the file is loaded into
+        Output:
+            - (relative path, valid records, quarantined records)
+        Functionality:
+            - A clean copy of the valid records (one per line, invalid UTF-8 bytes replaced with '?') is written
+              to clean_dir only if the file has both valid and bad records
+    """
+    schema = staging_schema(table)
+    required_columns = REQUIRED_COLUMNS.get(table, [])
+    relative_path = os.path.relpath(path, input_root)
+
+    with open(path, "rb") as input_file:
+        text = input_file.read().decode("utf-8", errors="copy_acceptinvchars")
+
+    valid, bad = [], []
+    for line_number, record_text, value, error in split_json_records(text):
+        errors = [error] if error else validate_record(value, schema, required_columns)
+        if errors:
+            bad.append({"line": line_number, "errors": errors, "record": record_text})
+        else:
+            valid.append(record_text)
+
+    if bad and valid:
+        clean_path = os.path.join(clean_dir, relative_path)
+        os.makedirs(os.path.dirname(clean_path), exist_ok=True)
+        with open(clean_path, "w", encoding="utf-8") as clean_file:
+            for record_text in valid:
+                clean_file.write(record_text + "\n")
+
+    if bad:
+        quarantine_path = os.path.join(quarantine_dir, relative_path + ".errors.json")
+        os.makedirs(os.path.dirname(quarantine_path), exist_ok=True)
+        with open(quarantine_path, "w", encoding="utf-8") as quarantine_file:
+            for entry in bad:
+                quarantine_file.write(json.dumps({"file": relative_path, **entry}) + "\n")
+
+    return relative_path, len(valid), len(bad)
+
+
+def validate_files(files, input_root, clean_dir, quarantine_dir, table, workers=None):
+    """
+        Purpose of the function:
+            - Validate all the input files of a staging load in a process pool
+        Input:
+            - files: local input files
+            - input_root, clean_dir, quarantine_dir, table: see validate_file()
+            - workers: number of worker processes (None = CPU count, 1 = validate in the current process)
+        Output:
+            - Summary dictionary: files, valid_records, quarantined_records, quarantined_files,
+              untouched_files (relative paths of the files to load as they are) and
+              rewritten_files (relative paths of the clean copies written to clean_dir)
+    """
+    arguments = [(path, input_root, clean_dir, quarantine_dir, table) for path in files]
+
+    if workers == 1 or len(files) <= 1:
+        results = [validate_file(*argument) for argument in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(validate_file, *zip(*arguments), chunksize=max(1, len(files) // 64)))
+
+    return {
+        "files": len(files),
+        "valid_records": sum(valid for _, valid, _ in results),
+        "quarantined_records": sum(bad for _, _, bad in results),
+        "quarantined_files": sum(1 for _, _, bad in results if bad),
+        "untouched_files": [relative_path for relative_path, _, bad in results if not bad],
+        "rewritten_files": [relative_path for relative_path, valid, bad in results if bad and valid],
+    }
@@ -0,0 +1,375 @@
+import os
+import tempfile
+
+from udacity.common.execution_backend import manifest_key, write_copy_manifest
+from udacity.common.final_project_sql_statements import SqlQueries
+from udacity.common.input_validation import validate_files
+from udacity.common.partitions import epoch_ms_partition_sql, format_partition, partition_predicate, \
+    render_partition_filter
+
+"""
+    Purpose of the script:
+        - Hold the logic of every pipeline step as plain functions over an execution backend, so the Airflow
+          operators, the benchmark harness and the tests all run the same code paths.
+
+    Inputs:
+        - backend: execution backend from execution_backend.py (Redshift, Postgres or DuckDB)
+        - log: logger (the operator's self.log, or a logging.Logger outside Airflow)
+        - partitions: partitions recorded by the staging step - None means all partitions, [] means nothing to do
+
+    Outputs:
+        - The staged, fact, dimension and aggregate tables loaded; quality checks raise ValueError on failure
+
+    Functionality:
+        - stage_table / prevalidate_source: StageToRedshiftOperator
+        - load_fact: LoadFactOperator
+        - load_dimension: LoadDimensionOperator
+        - run_quality_checks: DataQualityOperator
+        - load_aggregate / verify_aggregate: LoadAggregateOperator
+"""
+
+STAGING_TABLES = {
+    "staging_events": SqlQueries.staging_events_table_create,
+    "staging_songs": SqlQueries.staging_songs_table_create,
+}
+
+FACT_TABLES = {
+    "songplay": SqlQueries.songplay_table_create,
+}
+
+DIMENSION_TABLES = {
+    "user_info": SqlQueries.user_table_create,
+    "song": SqlQueries.song_table_create,
+    "artist": SqlQueries.artist_table_create,
+    "time": SqlQueries.time_table_create,
+}
+
+AGGREGATE_TABLES = {
+    "songplay_hourly_level": SqlQueries.songplay_hourly_level_table_create,
+    "songplay_hourly_artist": SqlQueries.songplay_hourly_artist_table_create,
+}
+
+
+class InputValidationError(ValueError):
+    """
+        Raised when the pre-flight validation rejects a load - the data has to be fixed, retrying will not help
+    """
+
+
+def create_table_if_missing(backend, table, create_sql, log):
+    """
+        Purpose of the function:
+            - Create a table from its CREATE statement if it does not exist yet
+        Output:
+            - True if the table was created
+    """
+    check_table_exists_sql = f"""
+        SELECT 1
+        FROM information_schema.tables
+        WHERE table_schema = 'public'
+        AND table_name = '{table}';
+    """
+    if backend.get_records(check_table_exists_sql):
+        log.info(f"Table '{table}' already exists.")
+        return False
+
+    log.info(f"Table '{table}' does not exist.")
+    backend.run(create_sql)
+    log.info(f"Table '{table}' created successfully.")
+    return True
+
+
+def _log_partitions(partitions, partition_granularity, target_table, log):
+    """
+        Purpose of the function:
+            - Log the partition scope of a step
+        Output:
+            - False if the step has nothing to do (empty partition list)
+    """
+    if partitions is None:
+        return True
+    log.info(f"Reprocessing {len(partitions)} {partition_granularity} partition(s) of '{target_table}': {partitions}")
+    if not partitions:
+        log.info(f"No partitions to reprocess for '{target_table}'.")
+        return False
+    return True
+
+
+def prevalidate_source(backend, bucket, source_key, table, log, aws_conn_id="", validated_prefix="validated",
+                       quarantine_prefix="quarantine", workers=None, max_quarantined_records=None):
+    """
+        Purpose of the function:
+            - Validate the input files locally before COPY so bad records cost local CPU, not failed cluster loads
+        Input:
+            - backend: execution backend (provides the file download/upload)
+            - bucket, source_key: location of the input files
+            - table: staging table the files are loaded into
+            - validated_prefix, quarantine_prefix: prefixes receiving the clean files and the rejected records
+            - workers: number of validation processes (None = CPU count, 1 = in the current process)
+            - max_quarantined_records: reject the load above this number of bad records
+        Output:
+            - (key of the COPY manifest to load with the MANIFEST option, validation summary from validate_files())
+        Functionality:
+            - Downloads the input files (the local backends read them in place)
+            - Validates every record against the staging schema in a process pool
+            - Publishes the rejected records to the quarantine prefix
+            - Publishes to the validated prefix only the clean copies of the files which had bad lines, plus a COPY
+              manifest listing them and the untouched original files
+            - Raises InputValidationError when no record is valid or above max_quarantined_records
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_root, files = backend.fetch_source_files(bucket, source_key, os.path.join(work_dir, "input"), aws_conn_id)
+        clean_dir = os.path.join(work_dir, "clean")
+        quarantine_dir = os.path.join(work_dir, "quarantine")
+        os.makedirs(clean_dir)
+        os.makedirs(quarantine_dir)
+
+        log.info(f"Validating {len(files)} file(s) against the {table} schema")
+        summary = validate_files(files, input_root, clean_dir, quarantine_dir, table, workers)
+        log.info(f"Validation summary: {summary['files']} file(s), {summary['valid_records']} valid record(s), "
+                 f"{summary['quarantined_records']} quarantined record(s) in {summary['quarantined_files']} file(s), "
+                 f"{len(summary['rewritten_files'])} file(s) rewritten")
+
+        backend.publish_files(bucket, quarantine_dir, quarantine_prefix, source_key, aws_conn_id)
+        if summary["quarantined_records"]:
+            log.warning(f"{summary['quarantined_records']} record(s) quarantined to {quarantine_prefix}/{source_key}")
+
+        if max_quarantined_records is not None and summary["quarantined_records"] > max_quarantined_records:
+            raise InputValidationError(f"{summary['quarantined_records']} invalid record(s) exceed the limit of "
+                                       f"{max_quarantined_records}. COPY was not run.")
+        if not summary["valid_records"]:
+            raise InputValidationError(f"No valid records found under {source_key}. COPY was not run.")
+
+        keys = ([path.replace(os.sep, "/") for path in summary["untouched_files"]] +
+                [f"{validated_prefix}/{path}".replace(os.sep, "/") for path in summary["rewritten_files"]])
+        copy_manifest_key = manifest_key(validated_prefix, source_key)
+        write_copy_manifest(os.path.join(clean_dir, os.path.relpath(copy_manifest_key, validated_prefix)), bucket, keys)
+        backend.publish_files(bucket, clean_dir, validated_prefix, source_key, aws_conn_id)
+
+    return copy_manifest_key, summary
+
+
+def stage_table(backend, table, source_key, copy_sql, log, partition_column=None, partition_granularity="hour"):
+    """
+        Purpose of the function:
+            - Drop/re-create a staging table and load it (COPY on Redshift, local bulk load otherwise)
+        Input:
+            - source_key: key of the files to load; copy_sql: COPY command used by the Redshift backend
+            - partition_column: epoch-milliseconds column whose partitions are recorded (e.g. ts)
+        Output:
+            - Sorted list of the partitions touched by the batch, or None if partition_column is not set
+    """
+    if table not in STAGING_TABLES:
+        raise ValueError(f"Unknown staging table: {table}")
+
+    log.info(f"Dropping and re-creating staging table: {table}")
+    backend.run(STAGING_TABLES[table])
+
+    try:
+        backend.load_staging(table, source_key, copy_sql)
+        log.info("COPY command completed successfully.")
+    except Exception as e:
+        log.error(f"Error executing COPY command: {e}")
+        raise
+
+    if not partition_column:
+        return None
+
+    partitions = sorted(format_partition(row[0]) for row in backend.get_records(f"""
+        SELECT DISTINCT {epoch_ms_partition_sql(partition_column, partition_granularity)}
+        FROM {table}
+        WHERE {partition_column} IS NOT NULL
+    """))
+    log.info(f"Staged batch touches {len(partitions)} {partition_granularity} partition(s): {partitions}")
+    return partitions
+
+
+def load_fact(backend, target_table, sql_query, log, append_only=False, partitions=None,
+              partition_column="start_time", partition_granularity="hour"):
+    """
+        Purpose of the function:
+            - Load a fact table - all rows, or only the given partitions (delete + rebuild)
+    """
+    if target_table not in FACT_TABLES:
+        raise ValueError(f"Unknown fact table: {target_table}")
+    create_table_if_missing(backend, target_table, FACT_TABLES[target_table], log)
+
+    if not _log_partitions(partitions, partition_granularity, target_table, log):
+        return
+    predicate = partition_predicate(partition_column, partitions, partition_granularity)
+
+    # Delete data if append-only=False
+    if not append_only:
+        log.info(f"Append mode is set to False. Deleting data from '{target_table}'.")
+        if partitions is None:
+            backend.run(f"DELETE FROM {target_table}")
+        else:
+            backend.run(f"DELETE FROM {target_table} WHERE {predicate}")
+    else:
+        log.info(f"Append mode is set to True. No records deletion for '{target_table}'.")
+
+    # Insert new data
+    log.info(f"Inserting data into '{target_table}' fact table.")
+    if partitions is None:
+        insert_statement = f"INSERT INTO {target_table} \n{sql_query}"
+    else:
+        insert_statement = (f"INSERT INTO {target_table} \n"
+                            f"SELECT * FROM ({sql_query}) partition_source WHERE {predicate}")
+    log.info(f"Running SQL:\n{insert_statement}")
+    backend.run(insert_statement)
+
+    log.info(f"Successfully completed loading data into '{target_table}' fact table.")
+
+
+def load_dimension(backend, target_table, sql_query, log, truncate=True, partitions=None,
+                   partition_column="start_time", partition_granularity="hour", merge=False):
+    """
+        Purpose of the function:
+            - Load a dimension table - truncate + insert, or only the staged batch when partitions are given:
+                - merge=True (user_info): insert the rows of the batch which are not in the table yet - the batch
+                  holds some days only, the rows the table got from the other days are kept
+                - otherwise (time): delete + rebuild of the given partitions of partition_column
+    """
+    if target_table not in DIMENSION_TABLES:
+        raise ValueError(f"Unknown dimension table: {target_table}")
+    log.info(f"Loading data into {target_table}")
+    create_table_if_missing(backend, target_table, DIMENSION_TABLES[target_table], log)
+
+    if partitions is not None and merge:
+        if not partitions:
+            log.info(f"The staged batch is empty. Nothing to merge into '{target_table}'.")
+            return
+        log.info(f"Merging the new rows of the staged batch ({len(partitions)} {partition_granularity} partition(s)) "
+                 f"into dimension table {target_table}")
+        # EXCEPT compares NULLs as equal, so rows with NULL columns are not inserted twice
+        backend.run(f"""
+            INSERT INTO {target_table}
+            SELECT * FROM ({sql_query}) merge_source
+            EXCEPT
+            SELECT * FROM {target_table};
+        """)
+        log.info(f"Data successfully loaded into {target_table}")
+        return
+
+    if not _log_partitions(partitions, partition_granularity, target_table, log):
+        return
+    predicate = partition_predicate(partition_column, partitions, partition_granularity)
+
+    # If truncate is enabled, first truncate the table
+    if truncate and partitions is None:
+        log.info(f"Truncating dimension table {target_table}")
+        backend.run(f"TRUNCATE TABLE {target_table};")
+    elif truncate:
+        log.info(f"Deleting the reprocessed partitions from dimension table {target_table}")
+        backend.run(f"DELETE FROM {target_table} WHERE {predicate}")
+
+    # Load the new data
+    log.info(f"Inserting new data into {target_table}")
+    if partitions is None:
+        insert_statement = f"INSERT INTO {target_table} \n{sql_query}"
+    else:
+        insert_statement = (f"INSERT INTO {target_table} \n"
+                            f"SELECT * FROM ({sql_query}) partition_source WHERE {predicate}")
+    backend.run(insert_statement)
+
+    log.info(f"Data successfully loaded into {target_table}")
+
+
+def run_quality_checks(backend, sql_queries, expected_results, log, partitions=None,
+                       partition_column="start_time", partition_granularity="hour"):
+    """
+        Purpose of the function:
+            - Run the data quality checks, scoped to the given partitions through {partition_filter}
+        Output:
+            - Raises a ValueError if a query returns no result or a result different from the expected one
+    """
+    if partitions is not None:
+        log.info(f"Checking {len(partitions)} {partition_granularity} partition(s): {partitions}")
+
+    for i, query in enumerate(sql_queries):
+        query = render_partition_filter(query, partition_column, partitions, partition_granularity)
+        log.info(f"Executing query number {i+1}: {query}")
+
+        result = backend.get_records(query)
+
+        if not result or not result[0]:
+            raise ValueError(f"Query returned no results: {query}")
+
+        actual_result = result[0][0]
+        expected_result = expected_results[i]
+
+        if actual_result != expected_result:
+            raise ValueError(f"Data quality check has failed. Query: {query}"
+                             f"Expected result: {expected_result} vs Actual result: {actual_result}")
+
+        log.info(f"Data quality check has succeeded. Query: {query} vs Result: {actual_result}")
+
+
+def load_aggregate(backend, target_table, sql_query, log, partitions=None, full_refresh=False, verify=False,
+                   partition_column="start_hour", source_partition_column="songplay.start_time",
+                   partition_granularity="hour"):
+    """
+        Purpose of the function:
+            - Delta merge of the given partitions into an aggregate table, or full refresh
+              (full_refresh=True, new table or partitions=None)
+    """
+    if target_table not in AGGREGATE_TABLES:
+        raise ValueError(f"Unknown aggregate table: {target_table}")
+
+    # A new table is always fully computed
+    if create_table_if_missing(backend, target_table, AGGREGATE_TABLES[target_table], log):
+        full_refresh = True
+
+    if full_refresh or partitions is None:
+        log.info(f"Full refresh of aggregate table '{target_table}'.")
+        backend.run(f"""
+            TRUNCATE TABLE {target_table};
+            INSERT INTO {target_table}
+            {render_partition_filter(sql_query, source_partition_column, None)};
+        """)
+    elif not partitions:
+        log.info(f"No partitions to merge into '{target_table}'.")
+    else:
+        log.info(f"Merging {len(partitions)} {partition_granularity} partition(s) into '{target_table}': {partitions}")
+        target_predicate = partition_predicate(partition_column, partitions, partition_granularity)
+        delta_sql = render_partition_filter(sql_query, source_partition_column, partitions, partition_granularity)
+        backend.run(f"""
+            DELETE FROM {target_table} WHERE {target_predicate};
+            INSERT INTO {target_table}
+            {delta_sql};
+        """)
+
+    if verify:
+        verify_aggregate(backend, target_table, sql_query, log, source_partition_column)
+
+    log.info(f"Aggregate table '{target_table}' is up to date.")
+
+
+def verify_aggregate(backend, target_table, sql_query, log, source_partition_column="songplay.start_time"):
+    """
+        Purpose of the function:
+            - Compare the maintained aggregate table with a full recomputation from the source
+            - EXCEPT compares distinct rows, so the row counts are compared too: the recomputation is grouped by the
+              grain (one row per key), so equal distinct rows and equal counts mean no duplicated rows in the table
+        Output:
+            - Raises a ValueError with the number of differing rows if they do not match
+    """
+    recompute_sql = render_partition_filter(sql_query, source_partition_column, None)
+    diff_sql = f"""
+        SELECT
+            (SELECT COUNT(*) FROM (
+                (SELECT * FROM {target_table} EXCEPT SELECT * FROM ({recompute_sql}) recomputed)
+                UNION ALL
+                (SELECT * FROM ({recompute_sql}) recomputed EXCEPT SELECT * FROM {target_table})
+            ) differences),
+            (SELECT COUNT(*) FROM {target_table}),
+            (SELECT COUNT(*) FROM ({recompute_sql}) recomputed)
+    """
+    differences, table_rows, recomputed_rows = backend.get_records(diff_sql)[0]
+    if differences:
+        raise ValueError(f"Aggregate table '{target_table}' differs from the recomputed result "
+                         f"in {differences} row(s)")
+    if table_rows != recomputed_rows:
+        raise ValueError(f"Aggregate table '{target_table}' has {table_rows} row(s), the recomputed result has "
+                         f"{recomputed_rows} - duplicated rows")
+    log.info(f"Aggregate table '{target_table}' matches the recomputed result.")
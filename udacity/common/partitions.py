@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+"""
+    Purpose of the script:
+        - Helpers for partition-scoped reprocessing: staging records which event-time partitions (hour or day of `ts`)
+          a batch touches, the fact/time loads and the quality checks only delete, rebuild and check those partitions.
+
+    Inputs:
+        - Partitions as 'YYYY-MM-DD HH:MM:SS' strings (the start of each hour/day) - the XCom value returned by
+          StageToRedshiftOperator when `partition_column` is set
+        - granularity: "hour" or "day"
+
+    Outputs:
+        - SQL expressions and predicates which work on Redshift, Postgres and DuckDB (after execution_backend rewrites)
+"""
+
+PARTITION_FILTER = "{partition_filter}"
+PARTITION_FORMAT = "%Y-%m-%d %H:%M:%S"
+GRANULARITIES = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+
+def _check_granularity(granularity):
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown partition granularity: {granularity}")
+
+
+def epoch_ms_partition_sql(column, granularity="hour"):
+    """
+        Purpose of the function:
+            - SQL expression truncating an epoch-milliseconds column (e.g. staging_events.ts) to its partition
+    """
+    _check_granularity(granularity)
+    return f"date_trunc('{granularity}', TIMESTAMP 'epoch' + {column}/1000 * interval '1 second')"
+
+
+def format_partition(value):
+    """
+        Purpose of the function:
+            - Convert a partition returned by the database (datetime or string) to the XCom string format
+    """
+    if isinstance(value, datetime):
+        return value.strftime(PARTITION_FORMAT)
+    return str(value)[:19]
+
+
+def partition_predicate(column, partitions, granularity="hour"):
+    """
+        Purpose of the function:
+            - Build a range predicate on a timestamp column covering the given partitions
+        Input:
+            - column: timestamp column (e.g. start_time)
+            - partitions: list of partition strings; None means "all partitions"
+            - granularity: "hour" or "day"
+        Output:
+            - SQL predicate; consecutive partitions are merged into one range so the predicate stays short
+              and Redshift can use the zone maps of the column
+    """
+    _check_granularity(granularity)
+    if partitions is None:
+        return "1 = 1"
+    if not partitions:
+        return "1 = 0"
+
+    step = GRANULARITIES[granularity]
+    starts = sorted({datetime.strptime(format_partition(partition), PARTITION_FORMAT) for partition in partitions})
+
+    ranges = []
+    for start in starts:
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = start + step
+        else:
+            ranges.append([start, start + step])
+
+    return "(" + " OR ".join(
+        f"({column} >= '{start.strftime(PARTITION_FORMAT)}' AND {column} < '{end.strftime(PARTITION_FORMAT)}')"
+        for start, end in ranges
+    ) + ")"
+
+
+def render_partition_filter(sql, column, partitions, granularity="hour"):
+    """
+        Purpose of the function:
+            - Replace the {partition_filter} placeholder of a query (e.g. a data quality check) with the predicate
+    """
+    return sql.replace(PARTITION_FILTER, partition_predicate(column, partitions, granularity))
+
+
+def pull_partitions(context, partitions_task_id, log=None):
+    """
+        Purpose of the function:
+            - Read the partitions recorded by the staging task from XCom
+        Input:
+            - context: Airflow execution context
+            - partitions_task_id: task_id of the staging task; None disables partition-scoped processing
+            - log: logger warning when the staging task recorded nothing
+        Output:
+            - List of partition strings, or None when every partition has to be processed
+    """
+    if not partitions_task_id:
+        return None
+    partitions = context["ti"].xcom_pull(task_ids=partitions_task_id)
+    if partitions is None and log is not None:
+        log.warning(f"No partitions recorded by '{partitions_task_id}'. Reloading all partitions.")
+    return partitions